@@ -0,0 +1,41 @@
+import os
+import sys
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from omsdetector_forked.atomic_parameters import Atom  # noqa: E402
+
+
+def time_call(statement, number, repeat):
+    """Time statement, keeping the best of repeat runs of number calls.
+
+    :return: Best time per call in microseconds.
+    """
+    timer = timeit.Timer(statement, globals={'Atom': Atom})
+    return 1e6 * min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time the creation of Atom objects and the bond check '
+                    'between two elements. Run it on two commits to compare '
+                    'them, Atom.get is only timed where it exists.')
+    parser.add_argument('--number', type=int, default=100000,
+                        help='Number of calls per run.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs, the best time is reported.')
+    args = parser.parse_args()
+
+    statements = ["Atom('Cu')",
+                  "Atom('Cu').check_bond('O', 2.0)"]
+    if hasattr(Atom, 'get'):
+        statements.append("Atom.get('Cu').check_bond('O', 2.0)")
+    print('{} calls, best of {} runs'.format(args.number, args.repeat))
+    for statement in statements:
+        t = time_call(statement, args.number, args.repeat)
+        print('{:40} {:8.2f} us'.format(statement, t))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from omsdetector_forked.mof import MofStructure  # noqa: E402
+
+
+def metal_sites(path_list):
+    """Build the coordination spheres of all the metal sites in the files.
+
+    :return: List of MetalSite objects.
+    """
+    sites = []
+    for path in path_list:
+        mof = MofStructure.from_file(path)
+        sites.extend(mof.metal_coord_spheres)
+    return sites
+
+
+def time_pass(sites, check, repeat):
+    """Time calling check on every site, keep the best of repeat passes.
+
+    :return: Best time of a pass in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for site in sites:
+            check(site)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                                  'cif_files_example')
+    parser = argparse.ArgumentParser(
+        description='Time check_if_open, which runs the dihedral plane test '
+                    'for sites with more than 3 linkers, over the metal '
+                    'sites of a folder of CIF files. Run it on two commits '
+                    'to compare them.')
+    parser.add_argument('folder', nargs='?', default=default_folder,
+                        help='Folder with the CIF files to read.')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of passes, the best time is reported.')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    path_list = sorted(glob.glob(os.path.join(args.folder, '*.cif')))
+    sites = metal_sites(path_list)
+    for site in sites:
+        site.check_if_open()
+    planar = [site for site in sites if site.num_linkers > 3]
+    print('{} metal sites, {} checked with the dihedral planes'.format(
+        len(sites), len(planar)))
+
+    t = time_pass(sites, lambda site: site.check_if_open(), args.repeat)
+    print('check_if_open {:8.3f} s per pass'.format(t))
+
+
+if __name__ == '__main__':
+    main()
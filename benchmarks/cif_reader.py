@@ -0,0 +1,90 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import warnings
+import numpy as np
+from pymatgen.core import Structure
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from omsdetector_forked.cif_reader import read_p1_cif  # noqa: E402
+from omsdetector_forked.mof import MofStructure  # noqa: E402
+
+
+def time_reader(path_list, read, repeat):
+    """Time reading all the files in path_list, keep the best of repeat
+    runs.
+
+    :return: Best total time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for path in path_list:
+            read(path)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def check_readers(path_list):
+    """Compare the structures read by the fast reader and by pymatgen.
+
+    :return: Number of files read by the fast reader, and the names of the
+    files for which the two readers disagree.
+    """
+    fast_read = 0
+    mismatch = []
+    for path in path_list:
+        cif_data = read_p1_cif(path)
+        if cif_data is None:
+            continue
+        fast_read += 1
+        lattice, species, frac_coords = cif_data
+        s = Structure.from_file(path)
+        same = ([str(sp) for sp in s.species] == species
+                and np.array_equal(s.frac_coords, frac_coords)
+                and np.array_equal(s.lattice.matrix, lattice.matrix))
+        if not same:
+            mismatch.append(os.path.basename(path))
+    return fast_read, mismatch
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                                  'cif_files_example')
+    parser = argparse.ArgumentParser(
+        description='Compare the fast P1 CIF reader with the pymatgen CIF '
+                    'parser.')
+    parser.add_argument('folder', nargs='?', default=default_folder,
+                        help='Folder with the CIF files to read.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best time is reported.')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    path_list = sorted(glob.glob(os.path.join(args.folder, '*.cif')))
+    fast_read, mismatch = check_readers(path_list)
+    print('{} CIF files, {} read by the fast reader, {} '
+          'mismatches'.format(len(path_list), fast_read, len(mismatch)))
+    for name in mismatch:
+        print('  mismatch: {}'.format(name))
+
+    timings = [
+        ('pymatgen Structure.from_file',
+         lambda p: Structure.from_file(p)),
+        ('read_p1_cif',
+         read_p1_cif),
+        ('MofStructure.from_file',
+         lambda p: MofStructure.from_file(p, checksum='')),
+        ('MofStructure.from_file(fast_reader=True)',
+         lambda p: MofStructure.from_file(p, checksum='', fast_reader=True)),
+    ]
+    for name, read in timings:
+        t = time_reader(path_list, read, args.repeat)
+        print('{:45} {:8.3f} s {:8.2f} ms/file'.format(
+            name, t, 1000 * t / len(path_list)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import warnings
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from omsdetector_forked.mof import MofStructure  # noqa: E402
+
+
+def time_policy(path_list, output_policy, repeat):
+    """Time analyze_metals for all the files in path_list with the given
+    output policy, keep the best of repeat runs. Reading the CIF files is not
+    included in the time.
+
+    :return: Best total time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        output_root = tempfile.mkdtemp()
+        total = 0.0
+        for path in path_list:
+            mof = MofStructure.from_file(path, checksum='')
+            output_folder = os.path.join(output_root, mof.summary['name'])
+            t0 = time.perf_counter()
+            mof.analyze_metals(output_folder, output_policy=output_policy)
+            total += time.perf_counter() - t0
+        shutil.rmtree(output_root)
+        best = min(best, total)
+    return best
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                                  'cif_files_example')
+    parser = argparse.ArgumentParser(
+        description='Time the OMS analysis with the different output '
+                    'policies.')
+    parser.add_argument('folder', nargs='?', default=default_folder,
+                        help='Folder with the CIF files to analyse.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best time is reported.')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    path_list = sorted(glob.glob(os.path.join(args.folder, '*.cif')))
+    times = {}
+    for output_policy in MofStructure.output_policies:
+        times[output_policy] = time_policy(path_list, output_policy,
+                                           args.repeat)
+    print('{} CIF files'.format(len(path_list)))
+    for output_policy, t in times.items():
+        print('{:10} {:8.3f} s {:8.2f} ms/file ({:.0f} % of full)'.format(
+            output_policy, t, 1000 * t / len(path_list),
+            100 * t / times['full']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+import os
+import io
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import warnings
+import resource
+import tracemalloc
+import subprocess
+import contextlib
+import numpy as np
+import pymatgen.core
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from omsdetector_forked.mof import MofStructure  # noqa: E402
+from omsdetector_forked.mof_collection import MofCollection  # noqa: E402
+
+STAGES = ['from_file', 'all_distances', 'all_coord_spheres_indices',
+          'metal_coord_spheres', 'check_if_open',
+          'find_coordination_sequences', 'write_results']
+
+
+def run_stages(path, output_root, clock=time.perf_counter, on_stage=None,
+               skip=()):
+    """Run the stages of the OMS analysis of a CIF file one after the other.
+    Every stage reuses what the previous stages computed, so its time only
+    covers its own work.
+
+    :param path: Path to the CIF file.
+    :param output_root: Folder to write the results to.
+    :param clock: Function returning the current time.
+    :param on_stage: Function called with the name of every stage before it
+    starts, used to reset the memory peak.
+    :param skip: Stages not to run, only all_distances can be skipped since
+    no other stage needs it.
+    :return: Dictionary with the time of every stage in seconds.
+    """
+    times = {}
+
+    @contextlib.contextmanager
+    def stage(name):
+        if on_stage is not None:
+            on_stage(name)
+        t0 = clock()
+        yield
+        times[name] = clock() - t0
+
+    with stage('from_file'):
+        mof = MofStructure.from_file(path, checksum='')
+    if 'all_distances' not in skip:
+        with stage('all_distances'):
+            mof.all_distances
+    with stage('all_coord_spheres_indices'):
+        mof.all_coord_spheres_indices
+    with stage('metal_coord_spheres'):
+        spheres = mof.metal_coord_spheres
+    with stage('check_if_open'):
+        for mcs in spheres:
+            mcs.check_if_open()
+    with stage('find_coordination_sequences'):
+        mof._find_coordination_sequences(mof.metal_indices)
+    # write_results needs the summary of the analysis, which reuses all the
+    # work done above.
+    mof.analyze_metals(None)
+    with stage('write_results'):
+        mof.write_results(os.path.join(output_root, mof.name))
+    if on_stage is not None:
+        on_stage(None)
+    return times
+
+
+def time_stages(path_list, repeat):
+    """Time the stages for every file, keeping the best of repeat runs.
+
+    :return: Dictionary of file name to dictionary of stage to seconds.
+    """
+    best = {}
+    for _ in range(repeat):
+        output_root = tempfile.mkdtemp()
+        for path in path_list:
+            name = os.path.basename(path)
+            times = run_stages(path, output_root)
+            best.setdefault(name, times)
+            for key, t in times.items():
+                best[name][key] = min(best[name][key], t)
+        shutil.rmtree(output_root)
+    return best
+
+
+def stage_peak_memory(path, output_root, skip=()):
+    """Measure with tracemalloc the peak of the memory allocated by Python
+    during each stage for a CIF file, on top of the memory in use when the
+    stage starts.
+
+    :return: Dictionary of stage to peak memory in MB.
+    """
+    peaks = {}
+    current = [None, 0]
+
+    def on_stage(name):
+        in_use, peak = tracemalloc.get_traced_memory()
+        if current[0] is not None:
+            peaks[current[0]] = (peak - current[1]) / 2 ** 20
+        tracemalloc.reset_peak()
+        current[:] = [name, in_use]
+
+    tracemalloc.start()
+    try:
+        run_stages(path, output_root, on_stage=on_stage, skip=skip)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def peak_memory(path_list):
+    """Measure the peak memory of each stage over all the files, see
+    stage_peak_memory.
+
+    :return: Dictionary of stage to peak memory in MB.
+    """
+    peaks = {}
+    output_root = tempfile.mkdtemp()
+    try:
+        for path in path_list:
+            for stage, peak in stage_peak_memory(path, output_root).items():
+                peaks[stage] = max(peaks.get(stage, 0), peak)
+    finally:
+        shutil.rmtree(output_root)
+    return peaks
+
+
+def time_collection(folder, repeat, num_batches):
+    """Time MofCollection.analyse_mofs end to end on a new analysis folder,
+    keeping the best of repeat runs.
+
+    :return: Best time in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        analysis_folder = tempfile.mkdtemp()
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            mof_coll = MofCollection.from_folder(
+                folder, analysis_folder=analysis_folder)
+            mof_coll.analyse_mofs(num_batches=num_batches)
+            best = min(best, time.perf_counter() - t0)
+        shutil.rmtree(analysis_folder)
+    return best
+
+
+def git_commit():
+    """Commit of the working tree, None if it cannot be found."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, reference):
+    """Print the time of every stage relative to a previous run."""
+    print('\nCompared to {}:'.format(reference.get('commit')))
+    for stage, values in results['stages'].items():
+        old = reference['stages'].get(stage)
+        if old is None or not old['time_s']:
+            continue
+        print('{:30} {:8.3f} s {:8.3f} s  x{:.2f}'.format(
+            stage, old['time_s'], values['time_s'],
+            values['time_s'] / old['time_s']))
+
+
+def main():
+    default_folder = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                                  'cif_files_example')
+    parser = argparse.ArgumentParser(
+        description='Time every stage of the OMS analysis and the analysis '
+                    'of a whole collection, and measure the peak memory. '
+                    'The results are written to a JSON file.')
+    parser.add_argument('folder', nargs='?', default=default_folder,
+                        help='Folder with the CIF files to analyse.')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of runs, the best time is reported.')
+    parser.add_argument('--num-batches', type=int, default=1,
+                        help='Number of worker processes for the collection '
+                             'analysis.')
+    parser.add_argument('--output', default='benchmark_pipeline.json',
+                        help='JSON file to write the results to.')
+    parser.add_argument('--compare', metavar='JSON',
+                        help='JSON file of a previous run to compare with.')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    path_list = sorted(glob.glob(os.path.join(args.folder, '*.cif')))
+    per_file = time_stages(path_list, args.repeat)
+    peaks = peak_memory(path_list)
+    collection_time = time_collection(args.folder, args.repeat,
+                                      args.num_batches)
+
+    stages = {}
+    for stage in STAGES:
+        total = sum(times[stage] for times in per_file.values())
+        stages[stage] = {'time_s': total,
+                         'ms_per_file': 1000 * total / len(path_list),
+                         'peak_memory_mb': peaks.get(stage)}
+    stages['analyse_mofs'] = {
+        'time_s': collection_time,
+        'ms_per_file': 1000 * collection_time / len(path_list),
+        'peak_memory_mb': None}
+    results = {
+        'commit': git_commit(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pymatgen': getattr(pymatgen.core, '__version__', None),
+        'platform': platform.platform(),
+        'folder': os.path.abspath(args.folder),
+        'num_files': len(path_list),
+        'repeat': args.repeat,
+        'num_batches': args.num_batches,
+        'max_rss_mb': resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'max_rss_workers_mb': resource.getrusage(
+            resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+        'stages': stages,
+        'per_file': per_file}
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=4)
+
+    print('{} CIF files, best of {} runs'.format(len(path_list), args.repeat))
+    for stage, values in stages.items():
+        peak = values['peak_memory_mb']
+        print('{:30} {:8.3f} s {:8.2f} ms/file {}'.format(
+            stage, values['time_s'], values['ms_per_file'],
+            '' if peak is None else '{:8.1f} MB peak'.format(peak)))
+    print('Results written to {}'.format(args.output))
+    if args.compare:
+        with open(args.compare) as reference_file:
+            compare(results, json.load(reference_file))
+
+
+if __name__ == '__main__':
+    main()
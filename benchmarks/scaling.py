@@ -0,0 +1,193 @@
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import warnings
+import numpy as np
+from pymatgen.core import Structure
+from pymatgen.io.cif import CifWriter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+from omsdetector_forked.mof import MofStructure  # noqa: E402
+from pipeline import run_stages, stage_peak_memory, git_commit  # noqa: E402
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+DEFAULT_CIFS = [os.path.join(EXAMPLES, 'HKUST-1_ASR_FIQCEN_clean.cif'),
+                os.path.join(EXAMPLES, 'MOF-5_ASR_MIBQAR_clean.cif')]
+
+
+def generate(cif_files, sizes, output_folder):
+    """Write n x n x n supercells of CIF files as a scaling corpus. The
+    supercells are written in P1 and the same input always gives the same
+    files.
+
+    :param cif_files: CIF files to make supercells of.
+    :param sizes: Values of n.
+    :param output_folder: Folder to write the supercells to, named
+    <name>_<n>x<n>x<n>.cif.
+    :return: Paths of the files written.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    paths = []
+    for cif_file in cif_files:
+        name = os.path.splitext(os.path.basename(cif_file))[0]
+        structure = Structure.from_file(cif_file)
+        for n in sizes:
+            supercell = structure * (n, n, n)
+            path = os.path.join(output_folder,
+                                '{}_{}x{}x{}.cif'.format(name, n, n, n))
+            CifWriter(supercell).write_file(path)
+            print('{:60} {:8d} atoms'.format(os.path.basename(path),
+                                             len(supercell)))
+            paths.append(path)
+    return paths
+
+
+def measure(path, skip):
+    """Time and measure the peak memory of every stage, and of
+    analyze_metals as a whole, for a CIF file.
+
+    :return: Dictionary with the number of atoms, and the time in seconds
+    and the peak memory in MB of every stage.
+    """
+    output_root = tempfile.mkdtemp()
+    try:
+        times = run_stages(path, output_root, skip=skip)
+        peaks = stage_peak_memory(path, output_root, skip)
+        mof = MofStructure.from_file(path, checksum='')
+        t0 = time.perf_counter()
+        mof.analyze_metals(None)
+        times['analyze_metals'] = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(output_root)
+    return {'num_atoms': len(mof), 'times': times, 'peak_memory_mb': peaks}
+
+
+def fit_exponent(num_atoms, values):
+    """Fit values = c * num_atoms ** k on a log-log scale.
+
+    :return: The exponent k, None if there are less than two sizes.
+    """
+    points = [(n, v) for n, v in zip(num_atoms, values)
+              if v is not None and v > 0]
+    if len({n for n, v in points}) < 2:
+        return None
+    x, y = np.log(np.array(points, dtype=float)).T
+    return float(np.polyfit(x, y, 1)[0])
+
+
+def scaling_exponents(results, key):
+    """Fit the scaling exponent of every stage for a measurement key,
+    'times' or 'peak_memory_mb', over all the files of a run."""
+    stages = list(dict.fromkeys(s for r in results for s in r[key]))
+    num_atoms = [r['num_atoms'] for r in results]
+    return {s: fit_exponent(num_atoms, [r[key].get(s) for r in results])
+            for s in stages}
+
+
+def plot(results, exponents, filename):
+    """Plot the time and the peak memory of every stage against the number
+    of atoms on log-log scales."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, 2, figsize=(14, 6))
+    num_atoms = np.array([r['num_atoms'] for r in results])
+    order = np.argsort(num_atoms)
+    for ax, key, label in [(axes[0], 'times', 'Time (s)'),
+                           (axes[1], 'peak_memory_mb', 'Peak memory (MB)')]:
+        for stage, k in exponents[key].items():
+            values = np.array([r[key].get(stage, np.nan) for r in results],
+                              dtype=float)
+            legend = stage if k is None else '{} (n^{:.2f})'.format(stage, k)
+            ax.plot(num_atoms[order], values[order], 'o-', label=legend)
+        ax.set_xscale('log')
+        ax.set_yscale('log')
+        ax.set_xlabel('Number of atoms')
+        ax.set_ylabel(label)
+        ax.legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(filename)
+    plt.close(fig)
+
+
+def run(folder, output, plot_file, skip):
+    """Measure every CIF file in a folder, fit the scaling exponents and
+    write the results to a JSON file."""
+    path_list = sorted(glob.glob(os.path.join(folder, '*.cif')))
+    results = []
+    for path in path_list:
+        result = measure(path, skip)
+        result['file'] = os.path.basename(path)
+        results.append(result)
+        print('{:60} {:8d} atoms {:9.3f} s analyze_metals'.format(
+            result['file'], result['num_atoms'],
+            result['times']['analyze_metals']))
+
+    exponents = {key: scaling_exponents(results, key)
+                 for key in ['times', 'peak_memory_mb']}
+    with open(output, 'w') as results_file:
+        json.dump({'commit': git_commit(),
+                   'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'folder': os.path.abspath(folder),
+                   'skipped_stages': list(skip),
+                   'exponents': exponents,
+                   'results': results}, results_file, indent=4)
+    print('\nScaling exponents, time ~ n^k and peak memory ~ n^k:')
+    for stage, k in exponents['times'].items():
+        k_mem = exponents['peak_memory_mb'].get(stage)
+        print('{:30} {:>6} {:>6}'.format(
+            stage, '-' if k is None else '{:.2f}'.format(k),
+            '-' if k_mem is None else '{:.2f}'.format(k_mem)))
+    print('Results written to {}'.format(output))
+    if plot_file:
+        plot(results, exponents, plot_file)
+        print('Plot written to {}'.format(plot_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Generate supercells of CIF files as a scaling corpus, '
+                    'and measure how the time and memory of every stage of '
+                    'the OMS analysis grow with the number of atoms.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    gen = commands.add_parser('generate', help='Write the scaling corpus.')
+    gen.add_argument('output_folder', help='Folder to write the supercells '
+                                           'to.')
+    gen.add_argument('--cif', nargs='+', default=DEFAULT_CIFS,
+                     help='CIF files to make supercells of (default: the '
+                          'HKUST-1 and MOF-5 examples).')
+    gen.add_argument('--sizes', nargs='+', type=int, default=[1, 2, 3, 4],
+                     help='Supercells of n x n x n unit cells are written '
+                          'for every n.')
+
+    meas = commands.add_parser('run', help='Measure the scaling on a '
+                                           'folder of CIF files.')
+    meas.add_argument('folder', help='Folder with the CIF files.')
+    meas.add_argument('--output', default='benchmark_scaling.json',
+                      help='JSON file to write the results to.')
+    meas.add_argument('--plot', default='benchmark_scaling.png',
+                      help='Image file for the plot, empty for no plot.')
+    meas.add_argument('--skip-all-distances', action='store_true',
+                      help='Do not compute the dense N x N distance matrix, '
+                           'which needs 8 N^2 bytes.')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    if args.command == 'generate':
+        generate(args.cif, args.sizes, args.output_folder)
+    else:
+        skip = ('all_distances',) if args.skip_all_distances else ()
+        run(args.folder, args.output, args.plot, skip)
+
+
+if __name__ == '__main__':
+    main()
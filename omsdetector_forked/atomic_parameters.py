@@ -1,136 +1,185 @@
+import numpy as np
+
+# Covalent radii taken from DOI: Covalent radii revisited
+# Beatriz Cordero,   Verónica Gómez,   Ana E. Platero-Prats,
+# Marc Revés,   Jorge Echeverría,  Eduard Cremades, Flavia Barragána
+# and Santiago Alvarez Dalton Trans., 2008, 2832-2838
+# DOI: 10.1039/B801115J
+_CO_ALL = {'H': 0.31,
+           'D': 0.31,
+           'He': 0.28,
+           'Li': 1.28,
+           'Be': 0.96,
+           'B': 0.84,
+           'C': 0.73,
+           'N': 0.71,
+           'O': 0.66,  # 0.8,
+           'F': 0.57,
+           'Ne': 0.58,
+           'Na': 1.66,
+           'Mg': 1.41,
+           'Al': 1.21,
+           'Si': 1.11,
+           'P': 1.07,
+           'S': 1.05,
+           'Cl': 1.02,
+           'Ar': 1.06,
+           'K': 2.03,
+           'Ca': 1.76,
+           'Sc': 1.7,
+           'Ti': 1.6,
+           'V': 1.53,
+           'Cr': 1.39,
+           'Mn': 1.5,
+           'Fe': 1.42,
+           'Co': 1.38,
+           'Ni': 1.24,
+           'Cu': 1.32,
+           'Zn': 1.22,
+           'Ga': 1.22,
+           'Ge': 1.2,
+           'As': 1.19,
+           'Se': 1.2,
+           'Br': 1.2,
+           'Kr': 1.16,
+           'Rb': 2.2,
+           'Sr': 1.95,
+           'Y': 1.9,
+           'Zr': 1.75,
+           'Nb': 1.64,
+           'Mo': 1.54,
+           'Tc': 1.47,
+           'Ru': 1.46,
+           'Rh': 1.42,
+           'Pd': 1.39,
+           'Ag': 1.45,
+           'Cd': 1.44,
+           'In': 1.42,
+           'Sn': 1.39,
+           'Sb': 1.39,
+           'Te': 1.38,
+           'I': 1.39,
+           'Xe': 1.4,
+           'Cs': 2.44,
+           'Ba': 2.15, #1.80
+           'La': 2.07,
+           'Ce': 2.04,
+           'Pr': 2.03,
+           'Nd': 2.01,
+           'Pm': 1.99,
+           'Sm': 1.98,
+           'Eu': 1.98,
+           'Gd': 1.96,
+           'Tb': 1.94,
+           'Dy': 1.92,
+           'Ho': 1.92,
+           'Er': 1.89,
+           'Tm': 1.9,
+           'Yb': 1.87,
+           'Lu': 1.87,
+           'Hf': 1.75,
+           'Ta': 1.7,
+           'W': 1.62,
+           'Re': 1.51,
+           'Os': 1.44,
+           'Ir': 1.41,
+           'Pt': 1.36,
+           'Au': 1.36,
+           'Hg': 1.32,
+           'Tl': 1.45,
+           'Pb': 1.46,
+           'Bi': 1.48,
+           'Po': 1.4,
+           'At': 1.5,
+           'Rn': 1.5,
+           'Fr': 2.6,
+           'Ra': 2.21,
+           'Ac': 2.15,
+           'Th': 2.06,
+           'Pa': 2,
+           'U': 1.96,
+           'Np': 1.9,
+           'Pu': 1.87,
+           'Am': 1.8,
+           'Cm': 1.69}
+ELEMENTS = ['H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
+            'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar', 'K', 'Ca',
+            'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn',
+            'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr', 'Rb', 'Sr', 'Y', 'Zr',
+            'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn',
+            'Sb', 'Te', 'I', 'Xe', 'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd',
+            'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb',
+            'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg',
+            'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn', 'Fr', 'Ra', 'Ac', 'Th',
+            'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm']
+NON_METALS = ['H', 'D', 'B', 'C', 'N', 'O', 'F',
+              'P', 'S', 'Cl', 'Se', 'Br', 'I']
+
+# Atomic number of every supported element, deuterium is treated as hydrogen.
+ATOMIC_NUMBERS = {e: z for z, e in enumerate(ELEMENTS, start=1)}
+ATOMIC_NUMBERS['D'] = 1
+
+# Element property tables indexed by atomic number, index 0 is unused.
+_z = np.arange(len(ELEMENTS) + 1)
+COVALENT_RADII = np.array([0.0] + [_CO_ALL[e] for e in ELEMENTS])
+IS_METAL = np.array([False] + [e not in NON_METALS for e in ELEMENTS])
+IS_HEAVY_METAL = COVALENT_RADII > 1.95
+IS_LANTHANIDE = (72 > _z) & (_z > 56)
+IS_ACTINIDE = (97 > _z) & (_z > 88)
+del _z
+
+
+def max_bond_matrix(elements):
+    """Get the maximum bond length between every pair of the given elements,
+    using the same radii and tolerances as Atom.max_bond.
+
+    :param elements: List of element symbols.
+    :return: Array with the maximum bond length between elements[i] and
+    elements[j] at position [i, j].
+    """
+    z = np.array([Atom.get(e).atomic_number for e in elements], dtype=int)
+    co = COVALENT_RADII[z]
+    heavy = IS_HEAVY_METAL[z]
+    bond_tol = np.where(heavy[:, np.newaxis] | heavy[np.newaxis, :], 0.2, 0.5)
+    return co[np.newaxis, :] + co[:, np.newaxis] + bond_tol
+
 
 class Atom:
     """A class to hold atomic information, and check bonds."""
 
+    _co_all = _CO_ALL
+    _list_of_non_metals = NON_METALS
+    _cache = {}
+
     def __init__(self, element):
         """Create an Atom object given an element.
 
         :param element: Element of the Atom object. This determines it's
         properties.
         """
-        # Covalent radii taken from DOI: Covalent radii revisited
-        # Beatriz Cordero,   Verónica Gómez,   Ana E. Platero-Prats,
-        # Marc Revés,   Jorge Echeverría,  Eduard Cremades, Flavia Barragána
-        # and Santiago Alvarez Dalton Trans., 2008, 2832-2838
-        # DOI: 10.1039/B801115J
-        self._co_all = {'H': 0.31,
-                        'D': 0.31,
-                        'He': 0.28,
-                        'Li': 1.28,
-                        'Be': 0.96,
-                        'B': 0.84,
-                        'C': 0.73,
-                        'N': 0.71,
-                        'O': 0.66,  # 0.8,
-                        'F': 0.57,
-                        'Ne': 0.58,
-                        'Na': 1.66,
-                        'Mg': 1.41,
-                        'Al': 1.21,
-                        'Si': 1.11,
-                        'P': 1.07,
-                        'S': 1.05,
-                        'Cl': 1.02,
-                        'Ar': 1.06,
-                        'K': 2.03,
-                        'Ca': 1.76,
-                        'Sc': 1.7,
-                        'Ti': 1.6,
-                        'V': 1.53,
-                        'Cr': 1.39,
-                        'Mn': 1.5,
-                        'Fe': 1.42,
-                        'Co': 1.38,
-                        'Ni': 1.24,
-                        'Cu': 1.32,
-                        'Zn': 1.22,
-                        'Ga': 1.22,
-                        'Ge': 1.2,
-                        'As': 1.19,
-                        'Se': 1.2,
-                        'Br': 1.2,
-                        'Kr': 1.16,
-                        'Rb': 2.2,
-                        'Sr': 1.95,
-                        'Y': 1.9,
-                        'Zr': 1.75,
-                        'Nb': 1.64,
-                        'Mo': 1.54,
-                        'Tc': 1.47,
-                        'Ru': 1.46,
-                        'Rh': 1.42,
-                        'Pd': 1.39,
-                        'Ag': 1.45,
-                        'Cd': 1.44,
-                        'In': 1.42,
-                        'Sn': 1.39,
-                        'Sb': 1.39,
-                        'Te': 1.38,
-                        'I': 1.39,
-                        'Xe': 1.4,
-                        'Cs': 2.44,
-                        'Ba': 2.15, #1.80
-                        'La': 2.07,
-                        'Ce': 2.04,
-                        'Pr': 2.03,
-                        'Nd': 2.01,
-                        'Pm': 1.99,
-                        'Sm': 1.98,
-                        'Eu': 1.98,
-                        'Gd': 1.96,
-                        'Tb': 1.94,
-                        'Dy': 1.92,
-                        'Ho': 1.92,
-                        'Er': 1.89,
-                        'Tm': 1.9,
-                        'Yb': 1.87,
-                        'Lu': 1.87,
-                        'Hf': 1.75,
-                        'Ta': 1.7,
-                        'W': 1.62,
-                        'Re': 1.51,
-                        'Os': 1.44,
-                        'Ir': 1.41,
-                        'Pt': 1.36,
-                        'Au': 1.36,
-                        'Hg': 1.32,
-                        'Tl': 1.45,
-                        'Pb': 1.46,
-                        'Bi': 1.48,
-                        'Po': 1.4,
-                        'At': 1.5,
-                        'Rn': 1.5,
-                        'Fr': 2.6,
-                        'Ra': 2.21,
-                        'Ac': 2.15,
-                        'Th': 2.06,
-                        'Pa': 2,
-                        'U': 1.96,
-                        'Np': 1.9,
-                        'Pu': 1.87,
-                        'Am': 1.8,
-                        'Cm': 1.69}
-
-        elements = ['H', 'He', 'Li', 'Be', 'B', 'C', 'N', 'O', 'F', 'Ne',
-                    'Na', 'Mg', 'Al', 'Si', 'P', 'S', 'Cl', 'Ar', 'K', 'Ca',
-                    'Sc', 'Ti', 'V', 'Cr', 'Mn', 'Fe', 'Co', 'Ni', 'Cu', 'Zn',
-                    'Ga', 'Ge', 'As', 'Se', 'Br', 'Kr', 'Rb', 'Sr', 'Y', 'Zr',
-                    'Nb', 'Mo', 'Tc', 'Ru', 'Rh', 'Pd', 'Ag', 'Cd', 'In', 'Sn',
-                    'Sb', 'Te', 'I', 'Xe', 'Cs', 'Ba', 'La', 'Ce', 'Pr', 'Nd',
-                    'Pm', 'Sm', 'Eu', 'Gd', 'Tb', 'Dy', 'Ho', 'Er', 'Tm', 'Yb',
-                    'Lu', 'Hf', 'Ta', 'W', 'Re', 'Os', 'Ir', 'Pt', 'Au', 'Hg',
-                    'Tl', 'Pb', 'Bi', 'Po', 'At', 'Rn', 'Fr', 'Ra', 'Ac', 'Th',
-                    'Pa', 'U', 'Np', 'Pu', 'Am', 'Cm']
-
-        self._list_of_non_metals = ['H', 'D', 'B', 'C', 'N', 'O', 'F',
-                                    'P', 'S', 'Cl', 'Se', 'Br', 'I']
-
         self.element = element
-        if self.element == 'D':
-            self.atomic_number = 1
-        else:
-            self.atomic_number = elements.index(self.element) + 1
+        if self.element not in ATOMIC_NUMBERS:
+            raise ValueError('{} is not a supported element'.format(element))
+        self.atomic_number = ATOMIC_NUMBERS[self.element]
         self._co = self._co_all[self.element]
+        self._is_metal = bool(IS_METAL[self.atomic_number])
+        self._is_heavy_metal = bool(IS_HEAVY_METAL[self.atomic_number])
+        self._is_lanthanide = bool(IS_LANTHANIDE[self.atomic_number])
+        self._is_actinide = bool(IS_ACTINIDE[self.atomic_number])
+
+    @classmethod
+    def get(cls, element):
+        """Get the shared Atom object for an element, creating it only the
+        first time the element is requested.
+
+        :param element: Element of the Atom object.
+        :return: Atom object for element.
+        """
+        try:
+            return cls._cache[element]
+        except KeyError:
+            atom = cls._cache[element] = cls(element)
+            return atom
 
     @property
     def co(self):
@@ -140,7 +189,7 @@ class Atom:
     @property
     def is_metal(self):
         """Check if atom is metal or not."""
-        return self.element not in self._list_of_non_metals
+        return self._is_metal
 
     @property
     def is_lanthanide_or_actinide(self):
@@ -150,12 +199,12 @@ class Atom:
     @property
     def is_lanthanide(self):
         """Check if atom is a lanthanide."""
-        return 72 > self.atomic_number > 56
+        return self._is_lanthanide
 
     @property
     def is_actinide(self):
         """Check if atom is a actinide."""
-        return 97 > self.atomic_number > 88
+        return self._is_actinide
 
     def bond_tolerance(self, ele2):
         """Determine if atom is a actinide."""
@@ -166,12 +215,12 @@ class Atom:
 
     def _check_if_heavy_metal_bond(self, ele2):
         """Determine if atom is a actinide."""
-        return self.is_heavy_metal or Atom(ele2).is_heavy_metal
+        return self.is_heavy_metal or Atom.get(ele2).is_heavy_metal
 
     @property
     def is_heavy_metal(self):  # \m/
         """Determine if atom has a covelant radii larger than 1.95."""
-        return self.co > 1.95
+        return self._is_heavy_metal
 
     def check_bond(self, ele2, dist, bond_tol=None):
         """Check if the atom is bonded with a given atom"""
@@ -192,4 +241,4 @@ class Atom:
         """
         if bond_tol is None:
             bond_tol = self.bond_tolerance(ele2)
-        return Atom(ele2).co + self.co + bond_tol
+        return Atom.get(ele2).co + self.co + bond_tol
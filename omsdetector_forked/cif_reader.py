@@ -0,0 +1,200 @@
+import re
+import functools
+import numpy as np
+from scipy.spatial import cKDTree
+from pymatgen.core import Element, Lattice
+from omsdetector_forked.atomic_parameters import ATOMIC_NUMBERS
+
+
+_TOKEN = re.compile(r"""'[^']*'(?=\s|$)|"[^"]*"(?=\s|$)|\S+""")
+
+_CELL_TAGS = ['_cell_length_a', '_cell_length_b', '_cell_length_c',
+              '_cell_angle_alpha', '_cell_angle_beta', '_cell_angle_gamma']
+_SYMOP_TAGS = ['_symmetry_equiv_pos_as_xyz',
+               '_space_group_symop_operation_xyz']
+_FRACT_TAGS = ['_atom_site_fract_x', '_atom_site_fract_y',
+               '_atom_site_fract_z']
+_P1_NAMES = {'P1', 'P 1'}
+_SITE_TOLERANCE = 1e-4
+_FRAC_TOLERANCE = 1e-4
+
+
+def _tokens(filename):
+    """Yield the tokens of the first data block of a CIF file, semicolon text
+    fields are returned as a single token."""
+    in_block = False
+    text_field = None
+    with open(filename, 'r', errors='replace') as cif_file:
+        for line in cif_file:
+            if text_field is not None:
+                if line.startswith(';'):
+                    yield '\n'.join(text_field)
+                    text_field = None
+                else:
+                    text_field.append(line.rstrip('\n'))
+                continue
+            if line.startswith(';'):
+                text_field = [line[1:].rstrip('\n')]
+                continue
+            for token in _TOKEN.findall(line):
+                if token.startswith('#'):
+                    break
+                if token.lower().startswith('data_'):
+                    if in_block:
+                        return
+                    in_block = True
+                    continue
+                if token[0] in '\'"' and len(token) > 1:
+                    token = token[1:-1]
+                yield token
+
+
+def _number(value):
+    """Convert a CIF numeric value, with an optional uncertainty such as
+    1.234(5), to float."""
+    return float(value.split('(')[0])
+
+
+def count_cif_atoms(filename):
+    """Count the atoms in the unit cell of a CIF file from its atom sites
+    and symmetry operations, without building a structure. Only the first
+    data block is read.
+
+    :param filename: Path to the CIF file.
+    :return: Number of atoms in the unit cell, this is an upper bound for
+    structures that are not P1 since atoms on special positions are counted
+    more than once.
+    """
+    loops = _parse(filename)[1]
+    atom_loop = _atom_site_loop(filename, loops)
+    num_sites = len(next(iter(atom_loop.values())))
+    return num_sites * _num_symops(loops)
+
+
+def _parse(filename):
+    """Read the data items and loops of the first data block of a CIF file.
+
+    :return: Dictionary of the data items and a list of the loops, each
+    loop is a dictionary of lists of values keyed by tag. Tags are in
+    lower case.
+    """
+    items = {}
+    loops = []
+    tokens = _tokens(filename)
+    token = next(tokens, None)
+    while token is not None:
+        lower = token.lower()
+        if lower == 'loop_':
+            tags = []
+            token = next(tokens, None)
+            while token is not None and token.startswith('_'):
+                tags.append(token.lower())
+                token = next(tokens, None)
+            values = []
+            while (token is not None and not token.startswith('_')
+                   and token.lower() != 'loop_'):
+                values.append(token)
+                token = next(tokens, None)
+            if tags:
+                n = len(tags)
+                loops.append({t: values[i::n] for i, t in enumerate(tags)})
+            continue
+        if lower.startswith('_'):
+            items[lower] = next(tokens, None)
+        token = next(tokens, None)
+    return items, loops
+
+
+def _num_symops(loops):
+    """Number of symmetry operations listed, 1 if none are listed."""
+    num_symops = 1
+    for loop in loops:
+        for tag in _SYMOP_TAGS:
+            if tag in loop:
+                num_symops = max(len(loop[tag]), 1)
+    return num_symops
+
+
+def _is_p1(items, loops):
+    """Check if the structure is in space group P1."""
+    space_group = None
+    for tag in ['_symmetry_space_group_name_h-m',
+                '_space_group_name_h-m_alt']:
+        if items.get(tag) is not None:
+            space_group = items[tag].strip()
+    return _num_symops(loops) == 1 and (space_group is None
+                                        or space_group in _P1_NAMES)
+
+
+def _atom_site_loop(filename, loops):
+    """Find the loop listing the atom sites."""
+    for loop in loops:
+        if '_atom_site_fract_x' in loop or '_atom_site_cartn_x' in loop:
+            return loop
+    raise ValueError('No atom sites found in {}'.format(filename))
+
+
+def read_p1_cif(filename):
+    """Read a P1 CIF file with fully occupied sites given in fractional
+    coordinates straight into NumPy arrays.
+
+    The coordinates are cleaned up, the sites are wrapped into the unit cell
+    and ordered by element in the same way as pymatgen's CifParser does, so
+    the result is the same structure pymatgen would create. Files that need
+    anything more, such as symmetry expansion, partial occupancies,
+    oxidation states or merging of overlapping sites, are not handled.
+
+    :param filename: Path to the CIF file.
+    :return: The lattice, the species and the fractional coordinates of the
+    sites, or None if the file is not handled.
+    """
+    items, loops = _parse(filename)
+    if not _is_p1(items, loops):
+        return None
+    for loop in loops:
+        for tag in _SYMOP_TAGS:
+            if tag in loop and (len(loop[tag]) != 1 or
+                                loop[tag][0].replace(' ', '').lower()
+                                != 'x,y,z'):
+                return None
+        if '_atom_type_oxidation_number' in loop:
+            return None
+    atom_loop = _atom_site_loop(filename, loops)
+    if '_atom_site_fract_x' not in atom_loop:
+        return None
+    for occupancy in atom_loop.get('_atom_site_occupancy', []):
+        if occupancy not in ('.', '?') and _number(occupancy) != 1.0:
+            return None
+    symbols = atom_loop.get('_atom_site_type_symbol')
+    if symbols is None or not all(s in ATOMIC_NUMBERS and s != 'D'
+                                  for s in symbols):
+        return None
+
+    lattice = Lattice.from_parameters(*[_number(items[t])
+                                        for t in _CELL_TAGS])
+    frac_coords = np.array([[_number(v) for v in atom_loop[t]]
+                            for t in _FRACT_TAGS]).T
+    # Like pymatgen, snap coordinates written with finite precision to
+    # exact thirds.
+    for fraction in (1 / 3, 2 / 3):
+        close = np.abs(frac_coords / fraction - 1) <= _FRAC_TOLERANCE
+        frac_coords[close] = fraction
+    frac_coords = frac_coords - np.floor(frac_coords)
+
+    # Overlapping sites are merged by pymatgen, leave those files to it.
+    tree = cKDTree(np.mod(frac_coords, 1.0), boxsize=1.0)
+    if tree.query_pairs(_SITE_TOLERANCE, p=np.inf):
+        return None
+
+    order = sorted(range(len(symbols)), key=lambda i: _element_rank(
+        symbols[i]))
+    species = [symbols[i] for i in order]
+    return lattice, species, frac_coords[order]
+
+
+@functools.lru_cache(maxsize=None)
+def _element_rank(symbol):
+    """Sort key placing elements in the order used by pymatgen's
+    CifParser."""
+    return Element(symbol)
+
@@ -1,21 +1,46 @@
 
 import json
 import copy
+import warnings
+import spglib
 from pymatgen.core import Structure
-from omsdetector_forked.atomic_parameters import Atom
+from pymatgen.core.units import Mass, Length
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from omsdetector_forked.atomic_parameters import Atom, max_bond_matrix
+from omsdetector_forked.neighbor_list import NeighborList
+from omsdetector_forked.cif_reader import read_p1_cif
 import numpy as np
 import sys
 import itertools
+import functools
 import os
 import shutil
 import hashlib
 import datetime
 import math
+import time
+import contextlib
+
+
+_AMU_TO_G = float(Mass(1, "amu").to("g"))
+_ANG3_TO_CM3 = float(Length(1, "ang").to("cm") ** 3)
+_NO_STAGE = contextlib.nullcontext()
+
+try:
+    from pymatgen.symmetry.analyzer import SymmetryUndeterminedError
+except ImportError:
+    # Older pymatgen versions return a dataset of None instead.
+    SymmetryUndeterminedError = ValueError
+# Older spglib versions return None instead of raising SpglibError.
+_SYMMETRY_ERRORS = (SymmetryUndeterminedError,
+                    getattr(spglib, 'SpglibError', SymmetryUndeterminedError))
 
 
 class MofStructure(Structure):
     """Extend the pymatgen Structure class to add MOF specific features"""
 
+    output_policies = ('summary', 'spheres', 'full')
+
     def __init__(self, lattice, species, coords, charge=None,
                  validate_proximity=False, to_unit_cell=False,
                  coords_are_cartesian=False, site_properties=None, name="N/A"):
@@ -36,16 +61,29 @@ class MofStructure(Structure):
 
         self._all_coord_spheres_indices = None
         self._all_distances = None
-        self._metal_coord_spheres = []
+        self._neighbor_list = None
+        self._bond_list = None
+        self._metal_coord_spheres = {}
+        self._representatives = None
         self._name = name
-        self.metal = None
-        self.metal_indices = []
-        self.organic = None
+        self._metal = None
+        self._organic = None
         self.species_str = [str(s) for s in self.species]
-
-        metal_set = set([s for s in self.species_str if Atom(s).is_metal])
-        non_metal_set = set([s for s in self.species_str
-                             if not Atom(s).is_metal])
+        # frac_coords of a Structure is rebuilt from the sites every time it
+        # is used, so it is kept as an array.
+        self.frac_coords_array = self.frac_coords
+        self.frac_coords_array.flags.writeable = False
+        self.unique_species, self.species_ids = np.unique(self.species_str,
+                                                          return_inverse=True)
+        self._bond_cutoffs = None
+        self._timer = StageTimer()
+
+        is_metal = np.array([Atom.get(s).is_metal
+                             for s in self.unique_species], dtype=bool)
+        self.metal_indices = np.flatnonzero(
+            is_metal[self.species_ids]).tolist()
+        metal_set = self.unique_species[is_metal].tolist()
+        non_metal_set = self.unique_species[~is_metal].tolist()
         todays_date = datetime.datetime.now().isoformat()
         self.summary = {'cif_okay': 'N/A',
                         'problematic': 'N/A',
@@ -53,18 +91,18 @@ class MofStructure(Structure):
                         'metal_sites': [],
                         'oms_density': 'N/A',
                         'checksum': 'N/A',
-                        'metal_species': list(metal_set),
-                        'non_metal_species': list(non_metal_set),
+                        'metal_species': metal_set,
+                        'non_metal_species': non_metal_set,
                         'name': name,
                         'uc_volume': self.volume,
-                        'density': self.density,
+                        'density': self._density(),
                         'date_created': str(todays_date)}
 
         self._tolerance = None
-        self._split_structure_to_organic_and_metal()
 
     @classmethod
-    def from_file(cls, filename, primitive=False, sort=False, merge_tol=0.0):
+    def from_file(cls, filename, primitive=False, sort=False, merge_tol=0.0,
+                  checksum=None, fast_reader=False, timings=False):
         """Create a MofStructure from a CIF file.
 
         This makes use of the from_file function of the Structure class and
@@ -82,53 +120,128 @@ class MofStructure(Structure):
         :param merge_tol: (float) If this is some positive number, sites that
         are within merge_tol from each other will be merged. Usually 0.01
         should be enough to deal with common numerical issues.
+        :param checksum: (str) Checksum of the file if already known, if None
+        it is computed from the file. Defaults to None.
+        :param fast_reader: (bool) Read P1 CIF files directly into NumPy
+        arrays instead of using the pymatgen CIF parser. Files the fast reader
+        cannot handle are read with pymatgen. Only used if primitive, sort
+        and merge_tol are not set. Defaults to False.
+        :param timings: (bool) Record the time taken to read the file, see
+        analyze_metals. Defaults to False.
         :return: Return the created MofStructure
         """
         mof_name = os.path.splitext(os.path.basename(filename))[0]
-        try:
-            s = Structure.from_file(filename, primitive=primitive, sort=sort,
-                                    merge_tol=merge_tol)
-            s_mof = cls(s.lattice, s.species, s.frac_coords, name=mof_name)
-            s_mof.summary['cif_okay'] = True
-            s_mof.summary['checksum'] = Helper.get_checksum(filename)
-        except Exception as e:
-            print('\nAn Exception occurred: {}'.format(e))
-            print('Cannot load {}\n'.format(filename))
-            # Make a placeholder MOF object, set all its summary entries
-            # to None and set cif_okay to False
-            s_mof = cls([[10, 0, 0], [0, 10, 0], [0, 0, 10]],
-                        ["C"], [[0, 0, 0]], name=mof_name)
-            s_mof._mark_failed_to_read()
-            s_mof.summary['cif_okay'] = False
+        timer = StageTimer(enabled=timings)
+        with timer.stage('parse'):
+            try:
+                cif_data = None
+                if fast_reader and not (primitive or sort or merge_tol):
+                    cif_data = cls._read_p1_cif(filename)
+                if cif_data is None:
+                    s = Structure.from_file(filename, primitive=primitive,
+                                            sort=sort, merge_tol=merge_tol)
+                    cif_data = s.lattice, s.species, s.frac_coords
+                s_mof = cls(*cif_data, name=mof_name)
+                s_mof.summary['cif_okay'] = True
+                if checksum is None:
+                    checksum = Helper.get_checksum(filename)
+                s_mof.summary['checksum'] = checksum
+            except Exception as e:
+                print('\nAn Exception occurred: {}'.format(e))
+                print('Cannot load {}\n'.format(filename))
+                # Make a placeholder MOF object, set all its summary entries
+                # to None and set cif_okay to False
+                s_mof = cls([[10, 0, 0], [0, 10, 0], [0, 0, 10]],
+                            ["C"], [[0, 0, 0]], name=mof_name)
+                s_mof._mark_failed_to_read()
+                s_mof.summary['cif_okay'] = False
+        s_mof._timer = timer
 
         return s_mof
 
-    def analyze_metals(self, output_folder, verbose='normal'):
+    @staticmethod
+    def _read_p1_cif(filename):
+        """Read a CIF file with the fast P1 reader.
+
+        :return: The lattice, species and fractional coordinates, or None if
+        the file has to be read with pymatgen.
+        """
+        try:
+            return read_p1_cif(filename)
+        except Exception:
+            return None
+
+    def analyze_metals(self, output_folder, verbose='normal',
+                       output_policy='full', use_symmetry=False, symprec=0.01,
+                       site_cache=None, timings=False):
         """Run analysis to detect all open metal sites in a MofStructure. In
         addition the metal sites are marked as unique.
 
         :param output_folder: Folder where OMS analysis results will be stored.
+        If None no files are written.
         :param verbose: Verbosity level for the output of the analysis.
+        :param output_policy: Which results are written to output_folder, see
+        write_results. (default: 'full')
+        :param use_symmetry: Analyze only one metal site of every set of
+        symmetry equivalent metal sites and copy its results, and its
+        coordination sphere in the output, to the others, which are never
+        unique. (default: False)
+        :param symprec: Tolerance used to find the symmetry of the structure
+        if use_symmetry is set. (default: 0.01)
+        :param site_cache: SiteCache used to reuse the classification of
+        coordination spheres seen before, in this or other MOFs.
+        (default: None)
+        :param timings: Record the wall time of every stage of the analysis,
+        and the change in the resident memory of the process during it,
+        under the 'timings' key of the summary. Includes the time taken to
+        read the CIF file if from_file was also called with timings set.
+        (default: False)
+        :return: The summary dictionary as stored in the results file.
         """
+        self._check_output_policy(output_policy)
+        if timings:
+            self._timer.enabled = True
 
-        Helper.make_folder(output_folder)
-        running_indicator = output_folder + "/analysis_running"
-        open(running_indicator, 'w').close()
+        if output_folder is not None:
+            Helper.make_folder(output_folder)
+            running_indicator = output_folder + "/analysis_running"
+            open(running_indicator, 'w').close()
 
         self.summary['problematic'] = False
 
-        ms_cs_list = {True: [], False: []}
-        for m, omc in enumerate(self.metal_coord_spheres):
-            m_index = self.metal_indices[m]
-            omc.check_if_open()
+        timer = self._timer
+        with timer.stage('neighbor_search'):
+            self.bond_list
+        if use_symmetry:
+            with timer.stage('symmetry'):
+                representatives = self._find_equivalent_metals(symprec)
+        else:
+            representatives = list(range(len(self.metal_indices)))
+        self._representatives = representatives
+        with timer.stage('coordination_sequences'):
+            all_cs = self._find_coordination_sequences(
+                self.metal_indices, equivalent=representatives)
+
+        ms_cs_keys = {True: set(), False: set()}
+        for m, m_index in enumerate(self.metal_indices):
+            if representatives[m] != m:
+                # Equivalent to a site analyzed before, so it has the same
+                # coordination sequence and cannot be unique.
+                metal_summary = dict(
+                    self.summary['metal_sites'][representatives[m]])
+                metal_summary['unique'] = False
+                self.summary['metal_sites'].append(metal_summary)
+                continue
+            omc = self._get_metal_coord_sphere(m)
+            with timer.stage('check_if_open'):
+                omc.check_if_open(site_cache)
             if not self.summary['problematic']:
                 self.summary['problematic'] = omc.is_problematic
 
-            cs = self._find_coordination_sequence(m_index)
-            cs = [self.species_str[m_index]] + cs
-            omc.is_unique = self._check_if_new_site(ms_cs_list[omc.is_open], cs)
-            if omc.is_unique:
-                ms_cs_list[omc.is_open].append(cs)
+            cs = [self.species_str[m_index]] + all_cs[m]
+            omc.cs_hash = self._cs_hash(cs)
+            omc.is_unique = self._check_if_new_site(ms_cs_keys[omc.is_open],
+                                                    cs)
 
             self.summary['metal_sites'].append(omc.metal_summary)
 
@@ -138,13 +251,17 @@ class MofStructure(Structure):
         self.summary['oms_density'] = sum(unique_sites) / self.volume
         self.summary['has_oms'] = any(open_sites)
 
-        self.write_results(output_folder, verbose)
+        if output_folder is None:
+            self._record_timings()
+            return self._results_summary(verbose)
+        summary = self.write_results(output_folder, verbose, output_policy)
         os.remove(running_indicator)
+        return summary
 
     def analyze_metal2(self):
         self.summary['problematic'] = False
 
-        ms_cs_list = {True: [], False: []}
+        ms_cs_keys = {True: set(), False: set()}
         for m, omc in enumerate(self.metal_coord_spheres):
             m_index = self.metal_indices[m]
             omc.check_if_open()
@@ -153,9 +270,9 @@ class MofStructure(Structure):
 
             cs = self._find_coordination_sequence(m_index)
             cs = [self.species_str[m_index]] + cs
-            omc.is_unique = self._check_if_new_site(ms_cs_list[omc.is_open], cs)
-            if omc.is_unique:
-                ms_cs_list[omc.is_open].append(cs)
+            omc.cs_hash = self._cs_hash(cs)
+            omc.is_unique = self._check_if_new_site(ms_cs_keys[omc.is_open],
+                                                    cs)
 
             self.summary['metal_sites'].append(omc.metal_summary)
 
@@ -164,37 +281,59 @@ class MofStructure(Structure):
 
         self.summary['oms_density'] = sum(unique_sites) / self.volume
         self.summary['has_oms'] = any(open_sites)
-        print ('Summary', summary)
-        print ("ms_cs_list", ms_cs_list)
 
-
-    def write_results(self, output_folder, verbose='normal'):
+    def write_results(self, output_folder, verbose='normal',
+                      output_policy='full'):
         """Store summary dictionary holding all MOF and OMS information to a
         JSON file, store CIF files for the metal and non-metal parts of the MOF
         as well as all the identified coordination spheres.
 
         :param output_folder: Location to be used to store
         :param verbose: Verbosity level (default: 'normal')
+        :param output_policy: 'summary' to write only the JSON file, 'spheres'
+        to also write the coordination spheres or 'full' to also write the
+        metal and non-metal parts of the MOF. (default: 'full')
+        :return: The summary dictionary written to the JSON file.
         """
+        self._check_output_policy(output_policy)
         Helper.make_folder(output_folder)
-        for index, mcs in enumerate(self.metal_coord_spheres):
-            mcs.write_cif_file(output_folder, index)
-        if self.metal:
-            output_fname = "{}/{}_metal.cif".format(output_folder,
-                                                    self.summary['name'])
-            self.metal.to(filename=output_fname)
-        output_fname = "{}/{}_organic.cif".format(output_folder,
-                                                  self.summary['name'])
-        self.organic.to(filename=output_fname)
+        with self._timer.stage('write_results'):
+            if output_policy in ('spheres', 'full'):
+                for index, mcs in enumerate(self.result_coord_spheres):
+                    mcs.write_cif_file(output_folder, index)
+            if output_policy == 'full':
+                if self.metal:
+                    output_fname = "{}/{}_metal.cif".format(
+                        output_folder, self.summary['name'])
+                    self.metal.to(filename=output_fname)
+                output_fname = "{}/{}_organic.cif".format(output_folder,
+                                                          self.summary['name'])
+                self.organic.to(filename=output_fname)
+        self._record_timings()
 
         json_file_out = "{}/{}.json".format(output_folder, self.summary['name'])
+        summary = self._results_summary(verbose)
+        with open(json_file_out, 'w') as outfile:
+            json.dump(summary, outfile, indent=3)
+        return summary
+
+    def _record_timings(self):
+        """Add the timings recorded so far to the summary, if enabled."""
+        if self._timer.enabled:
+            self.summary['timings'] = copy.deepcopy(self._timer.timings)
+
+    def _results_summary(self, verbose='normal'):
+        """Get a copy of the summary dictionary as stored in the results.
+
+        :param verbose: Verbosity level, if 'normal' the dihedral information
+        of the metal sites is left out. (default: 'normal')
+        """
         summary = copy.deepcopy(self.summary)
         if verbose == 'normal':
             for ms in summary["metal_sites"]:
                 ms.pop('all_dihedrals', None)
                 ms.pop('min_dihedral', None)
-        with open(json_file_out, 'w') as outfile:
-            json.dump(summary, outfile, indent=3)
+        return summary
 
     @property
     def tolerance(self):
@@ -217,12 +356,50 @@ class MofStructure(Structure):
 
     @property
     def all_distances(self):
-        """Distances between all atoms in the MofStructure"""
+        """Distances between all atoms in the MofStructure.
+
+        This is a dense N x N matrix and it is not used by the OMS analysis,
+        which relies on the sparse neighbor_list instead.
+        """
         if self._all_distances is None:
             self._all_distances = self.lattice.get_all_distances(
-                self.frac_coords, self.frac_coords)
+                self.frac_coords_array, self.frac_coords_array)
         return self._all_distances
 
+    @property
+    def bond_cutoffs(self):
+        """Maximum bond length between every pair of species in the
+        MofStructure, indexed by the values in species_ids."""
+        if self._bond_cutoffs is None:
+            self._bond_cutoffs = max_bond_matrix(self.unique_species)
+        return self._bond_cutoffs
+
+    @property
+    def neighbor_cutoff(self):
+        """Largest possible bond length between any two species in the
+        MofStructure."""
+        return self.bond_cutoffs.max()
+
+    @property
+    def neighbor_list(self):
+        """Sparse list of all neighbors closer than neighbor_cutoff, with their
+        distances and periodic images."""
+        if self._neighbor_list is None:
+            self._neighbor_list = NeighborList.from_structure(
+                self, self.neighbor_cutoff)
+        return self._neighbor_list
+
+    @property
+    def bond_list(self):
+        """Sparse list of all the bonds in the MofStructure, with their
+        lengths and periodic images."""
+        if self._bond_list is None:
+            nl = self.neighbor_list
+            max_bonds = self.bond_cutoffs[self.species_ids[nl.centers],
+                                          self.species_ids[nl.indices]]
+            self._bond_list = nl.select(nl.distances < max_bonds)
+        return self._bond_list
+
     @property
     def all_coord_spheres_indices(self):
         """Compute the indices of the atoms in the first coordination shell
@@ -240,10 +417,65 @@ class MofStructure(Structure):
         """For all metal atoms in a MofStructure compute the first coordination
         sphere as a MetalSite object.
         """
-        if not self._metal_coord_spheres:
-            self._metal_coord_spheres = [self._find_metal_coord_sphere(c)
-                                         for c in self.metal_indices]
-        return self._metal_coord_spheres
+        return [self._get_metal_coord_sphere(m)
+                for m in range(len(self.metal_indices))]
+
+    @property
+    def result_coord_spheres(self):
+        """The coordination sphere of every metal as written to the results.
+        After an analysis with use_symmetry the metals equivalent to an
+        analyzed metal get its sphere, as they get its summary, so their own
+        spheres are never built.
+        """
+        if self._representatives is None:
+            return self.metal_coord_spheres
+        return [self._get_metal_coord_sphere(r)
+                for r in self._representatives]
+
+    def _get_metal_coord_sphere(self, m):
+        """Get the first coordination sphere of the m-th metal atom, it is
+        computed the first time it is requested.
+
+        :param m: Position of the metal in metal_indices.
+        :return: The MetalSite of the metal.
+        """
+        if m not in self._metal_coord_spheres:
+            with self._timer.stage('coordination_spheres'):
+                self._metal_coord_spheres[m] = self._find_metal_coord_sphere(
+                    self.metal_indices[m])
+        return self._metal_coord_spheres[m]
+
+    def _find_equivalent_metals(self, symprec=0.01):
+        """Find the symmetry equivalent metal atoms using the space group of
+        the whole structure.
+
+        :param symprec: Tolerance used to find the symmetry.
+        :return: For every metal in metal_indices the position in
+        metal_indices of the first metal equivalent to it. If the symmetry
+        cannot be found every metal is only equivalent to itself.
+        """
+        representatives = list(range(len(self.metal_indices)))
+        try:
+            dataset = SpacegroupAnalyzer(
+                self, symprec=symprec).get_symmetry_dataset()
+        except _SYMMETRY_ERRORS as e:
+            warnings.warn('Cannot find the symmetry of {}, all its metal '
+                          'sites are analyzed: {}'.format(self.name, e))
+            return representatives
+        if dataset is None:
+            warnings.warn('Cannot find the symmetry of {}, all its metal '
+                          'sites are analyzed.'.format(self.name))
+            return representatives
+        # spglib versions before 2.5 return the dataset as a dictionary.
+        if isinstance(dataset, dict):
+            equivalent_atoms = dataset['equivalent_atoms']
+        else:
+            equivalent_atoms = dataset.equivalent_atoms
+        first = {}
+        for m, c in enumerate(self.metal_indices):
+            representatives[m] = first.setdefault(int(equivalent_atoms[c]),
+                                                  m)
+        return representatives
 
     def _mark_failed_to_read(self):
         """If a CIF cannot be read set certain properties to None"""
@@ -252,19 +484,53 @@ class MofStructure(Structure):
         self.summary['uc_volume'] = None
         self.summary['density'] = None
 
+    @property
+    def metal(self):
+        """pymatgen Structure containing only the metal atoms of the MOF,
+        created the first time it is used."""
+        if self._metal is None:
+            self._split_structure_to_organic_and_metal()
+        return self._metal
+
+    @property
+    def organic(self):
+        """pymatgen Structure containing only the non-metal atoms of the MOF,
+        created the first time it is used."""
+        if self._organic is None:
+            self._split_structure_to_organic_and_metal()
+        return self._organic
+
+    def _density(self):
+        """Compute the density in g/cm^3 from the number of atoms of each
+        species, this gives the same value as the density property of the
+        Structure without building the composition site by site."""
+        first, counts = np.unique(self.species_ids, return_index=True,
+                                  return_counts=True)[1:]
+        # Sum in order of first appearance, as in the composition.
+        weight = sum(float(counts[i]) * self[int(first[i])].specie.atomic_mass
+                     for i in np.argsort(first))
+        return weight * _AMU_TO_G / (self.volume * _ANG3_TO_CM3)
+
     def _split_structure_to_organic_and_metal(self):
         """Split a MOF to two pymatgen Structures, one containing only metal
          atoms and one containing only non-metal atoms."""
-        self.metal = Structure(self.lattice, [], [])
-        self.organic = Structure(self.lattice, [], [])
-        i = 0
-        for s, fc in zip(self.species, self.frac_coords):
-            if Atom(str(s)).is_metal:
-                self.metal.append(s, fc)
-                self.metal_indices.append(i)
-            else:
-                self.organic.append(s, fc)
-            i += 1
+        is_metal = np.zeros(len(self), dtype=bool)
+        is_metal[self.metal_indices] = True
+        species = self.species
+        self._metal = Structure(self.lattice,
+                                [species[i] for i in self.metal_indices],
+                                self.frac_coords_array[is_metal])
+        self._organic = Structure(self.lattice,
+                                  [species[i] for i in
+                                   np.flatnonzero(~is_metal)],
+                                  self.frac_coords_array[~is_metal])
+
+    @classmethod
+    def _check_output_policy(cls, output_policy):
+        """Raise a ValueError if output_policy is not known."""
+        if output_policy not in cls.output_policies:
+            raise ValueError('Unknown output policy {}, use one of {}'.format(
+                output_policy, ', '.join(cls.output_policies)))
 
     def _find_cs_indices(self, center):
         """Find the indices of the atoms in the coordination sphere.
@@ -272,14 +538,7 @@ class MofStructure(Structure):
         :param center: Central atom of coordination sphere.
         :return: c_sphere_indices: Return in the coordination sphere of center.
         """
-        dist = list(self.all_distances[center])
-        if dist[center] > 0.0000001:
-            sys.exit('The self distance appears to be non-zero')
-
-        a = Atom(self.species_str[center])
-        c_sphere_indices = [i for i, dis in enumerate(dist)
-                            if i != center
-                            and a.check_bond(self.species_str[i], dis)]
+        c_sphere_indices = self.bond_list.neighbors(center)[0].tolist()
         c_sphere_indices.insert(0, center)
         return c_sphere_indices
 
@@ -293,81 +552,175 @@ class MofStructure(Structure):
         :param center:
         :return:
         """
-        dist = self.all_distances[center]
-        if dist[center] > 0.0000001:
-            sys.exit('The self distance appears to be non-zero')
-
-        c_sphere = MetalSite(self.lattice, [self.species[center]],
-                             [self.frac_coords[center]],
-                             tolerance=self.tolerance)
-
         cs_i = self.all_coord_spheres_indices[center]
-        for i in cs_i[1:]:
-            c_sphere.append(self.species_str[i], self.frac_coords[i])
-        c_sphere.keep_valid_bonds()
+        c_sphere = MetalSite(self.lattice, [self.species_str[i] for i in cs_i],
+                             self.frac_coords_array[cs_i],
+                             tolerance=self.tolerance)
+        with self._timer.stage('keep_valid_bonds'):
+            c_sphere.keep_valid_bonds()
         c_sphere.center_around_metal()
         return c_sphere
 
     @staticmethod
-    def _check_if_new_site(cs_list, cs):
-        """Check if a given site is unique based on its coordination sequence"""
-        for cs_i in cs_list:
-            if Helper.compare_lists(cs_i, cs):
-                return False
-        return True  # len(cs_list),
+    def _check_if_new_site(cs_keys, cs):
+        """Check if a given site is unique based on its coordination sequence.
+        The sequences seen so far are kept in a set of tuples, so the check
+        takes constant time, and cs is added to it if it is new.
+
+        :param cs_keys: Set of the coordination sequences seen so far.
+        :param cs: Coordination sequence, the species of the metal followed
+        by the number of atoms in each shell.
+        :return: True if cs was not in cs_keys.
+        """
+        key = tuple(cs)
+        if key in cs_keys:
+            return False
+        cs_keys.add(key)
+        return True
+
+    @staticmethod
+    def _cs_hash(cs):
+        """Hash of a coordination sequence that is stable across processes
+        and runs, to compare metal sites of different MOFs.
+
+        :param cs: Coordination sequence, the species of the metal followed
+        by the number of atoms in each shell.
+        :return: Hexadecimal digest of the sequence.
+        """
+        key = ','.join(str(c) for c in cs)
+        return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
 
-    def _find_coordination_sequence(self, center):
-        """Compute the coordination sequence up to the 6th coordination shell.
+    def _find_coordination_sequence(self, center, n_shells=6):
+        """Compute the coordination sequence up to the n_shells coordination
+        shell.
 
         :param center: Atom to compute coordination sequence for
+        :param n_shells: Number of coordination shells (default: 6)
         :return cs: Coordination sequence for center
         """
-
-        shell_list = {(center, (0, 0, 0))}
-        shell_list_prev = set([])
-        all_shells = set(shell_list)
-        n_shells = 6
+        return self._find_coordination_sequences([center], n_shells)[0]
+
+    def _find_coordination_sequences(self, centers, n_shells=6,
+                                     equivalent=None):
+        """Compute the coordination sequences of several atoms with a single
+        breadth first traversal of the bond graph.
+
+        Each atom of a shell is encoded as an int64 key packing the index of
+        the center it belongs to, the atom index and its periodic image, so
+        that every shell of every center is expanded with the same array
+        operations.
+
+        :param centers: Atoms to compute coordination sequences for.
+        :param n_shells: Number of coordination shells (default: 6)
+        :param equivalent: For every center the position in centers of a
+        symmetry equivalent center, as returned by _find_equivalent_metals.
+        The traversal is done once for every set of equivalent centers and
+        the others get a copy of its sequence. (default: None)
+        :return: List with the coordination sequence of each center.
+        """
+        if equivalent is not None:
+            traversed = sorted(set(equivalent))
+            cs = dict(zip(traversed, self._find_coordination_sequences(
+                [centers[i] for i in traversed], n_shells)))
+            return [list(cs[i]) for i in equivalent]
+        centers = np.asarray(centers, dtype=np.int64)
+        bonds = self.bond_list
+        max_hop = int(np.abs(bonds.images).max()) if bonds.num_pairs else 0
+        offset = n_shells * max_hop
+        width = 2 * offset + 1
+        # Split the centers in groups small enough for the keys to fit in
+        # an int64.
+        group_size = max(1, 2 ** 62 // (len(self) * width ** 3))
         cs = []
-        count_total = 0
-        for n in range(0, n_shells):
-            c_set = set([])
-            for a_uc in shell_list:
-                a = a_uc[0]
-                lattice = a_uc[1]
-                coord_sphere = self.all_coord_spheres_indices[a]
-                count_total += 1
-                coord_sphere_with_uc = []
-                for c in coord_sphere:
-                    diff = self.frac_coords[a] - self.frac_coords[c]
-                    new_lat_i = [round(d, 0) for d in diff]
-                    uc = tuple(l-nl for l, nl in zip(lattice, new_lat_i))
-                    coord_sphere_with_uc.append((c, uc))
-                coord_sphere_with_uc = tuple(coord_sphere_with_uc)
-                c_set = c_set.union(set(coord_sphere_with_uc))
-            for a in shell_list_prev:
-                c_set.discard(a)
-            for a in shell_list:
-                c_set.discard(a)
-
-            cs.append(len(c_set))
-            all_shells = all_shells.union(c_set)
-            shell_list_prev = shell_list
-            shell_list = c_set
-
+        for start in range(0, len(centers), group_size):
+            group = centers[start:start + group_size]
+            cs.extend(self._coordination_sequence_bfs(group, n_shells,
+                                                      offset, width))
         return cs
 
+    def _coordination_sequence_bfs(self, centers, n_shells, offset, width):
+        """Breadth first traversal of the bond graph for a group of centers.
 
-class MetalSite(MofStructure):
-
-    def __init__(self, lattice, species, coords, validate_proximity=False,
-                 to_unit_cell=False, coords_are_cartesian=False,
-                 site_properties=None, tolerance=None, name='N/A'):
-        super().__init__(lattice, species, coords,
-                         validate_proximity=validate_proximity,
-                         to_unit_cell=to_unit_cell,
-                         coords_are_cartesian=coords_are_cartesian,
-                         site_properties=site_properties,
-                         name=name)
+        :param centers: Atoms to compute coordination sequences for.
+        :param n_shells: Number of coordination shells.
+        :param offset: Largest possible image index reached in n_shells.
+        :param width: Number of possible image indices along each axis.
+        :return: List with the coordination sequence of each center.
+        """
+        bonds = self.bond_list
+        num_atoms = len(self)
+        keys_per_center = num_atoms * width ** 3
+        degree = np.diff(bonds.indptr)
+
+        def encode(slot, atom, image):
+            key = slot * num_atoms + atom
+            for axis in range(3):
+                key = key * width + image[:, axis] + offset
+            return key
+
+        def decode(key):
+            image = np.empty((len(key), 3), dtype=np.int64)
+            for axis in (2, 1, 0):
+                key, image[:, axis] = np.divmod(key, width)
+                image[:, axis] -= offset
+            slot, atom = np.divmod(key, num_atoms)
+            return slot, atom, image
+
+        slots = np.arange(len(centers), dtype=np.int64)
+        shell = np.sort(encode(slots, centers,
+                               np.zeros((len(centers), 3), dtype=np.int64)))
+        shell_prev = np.empty(0, dtype=np.int64)
+        cs = np.empty((len(centers), n_shells), dtype=np.int64)
+        for n in range(0, n_shells):
+            slot, atom, image = decode(shell)
+            counts = degree[atom]
+            source = np.repeat(np.arange(len(shell)), counts)
+            first_edge = bonds.indptr[atom] - np.cumsum(counts) + counts
+            edges = np.repeat(first_edge, counts) + np.arange(counts.sum())
+            c_set = np.unique(encode(slot[source], bonds.indices[edges],
+                                     image[source] + bonds.images[edges]))
+            c_set = np.setdiff1d(c_set, np.union1d(shell_prev, shell),
+                                 assume_unique=True)
+
+            cs[:, n] = np.bincount(c_set // keys_per_center,
+                                   minlength=len(centers))
+            shell_prev = shell
+            shell = c_set
+
+        return cs.tolist()
+
+
+class MetalSite:
+    """The first coordination sphere of a metal atom.
+
+    Only the lattice, the species and the coordinates of the metal (always the
+    first site) and its ligands are kept. A pymatgen Structure is created only
+    when one is requested, e.g. to write a CIF file.
+    """
+
+    __slots__ = ('lattice', 'species', 'frac_coords', '_cart_coords',
+                 '_metal_type', '_tolerance', '_is_open', '_is_unique',
+                 '_is_problematic', '_t_factor', '_min_dihedral',
+                 '_all_dihedrals', 'cs_hash')
+
+    def __init__(self, lattice, species, coords, coords_are_cartesian=False,
+                 tolerance=None):
+        """Create a MetalSite.
+
+        :param lattice: pymatgen Lattice of the parent structure.
+        :param species: Element symbols of the metal followed by its ligands.
+        :param coords: Coordinates of the metal followed by its ligands.
+        :param coords_are_cartesian: Whether coords are Cartesian or
+        fractional. (default: False)
+        :param tolerance: Tolerance values for dihedral checks.
+        """
+        self.lattice = lattice
+        self.species = [str(s) for s in species]
+        coords = np.array(coords, dtype=float).reshape(-1, 3)
+        if coords_are_cartesian:
+            coords = lattice.get_fractional_coords(coords)
+        self.frac_coords = coords
+        self._cart_coords = None
 
         self._metal_type = "unknown"
         self._tolerance = tolerance
@@ -377,6 +730,38 @@ class MetalSite(MofStructure):
         self._t_factor = None
         self._min_dihedral = None
         self._all_dihedrals = {}
+        self.cs_hash = None
+
+    def __len__(self):
+        return len(self.species)
+
+    @property
+    def num_sites(self):
+        """Number of sites, metal included, in the MetalSite."""
+        return len(self.species)
+
+    @property
+    def cart_coords(self):
+        """Cartesian coordinates of the sites in the MetalSite."""
+        if self._cart_coords is None:
+            self._cart_coords = self.lattice.get_cartesian_coords(
+                self.frac_coords)
+        return self._cart_coords
+
+    def remove_sites(self, indices):
+        """Remove sites from the MetalSite.
+
+        :param indices: Indices of the sites to remove.
+        """
+        keep = np.ones(self.num_sites, dtype=bool)
+        keep[indices] = False
+        self.species = [s for s, k in zip(self.species, keep) if k]
+        self.frac_coords = self.frac_coords[keep]
+        self._cart_coords = None
+
+    def to_structure(self):
+        """Create a pymatgen Structure holding the MetalSite."""
+        return Structure(self.lattice, self.species, self.frac_coords)
 
     @property
     def tolerance(self):
@@ -417,11 +802,23 @@ class MetalSite(MofStructure):
         """The type of the metal center."""
         return self._metal_type
 
+    @property
+    def classification(self):
+        """The result of check_if_open as a tuple of is_open, metal_type,
+        t_factor and is_problematic."""
+        return (self._is_open, self._metal_type, self._t_factor,
+                self._is_problematic)
+
+    @classification.setter
+    def classification(self, value):
+        (self._is_open, self._metal_type, self._t_factor,
+         self._is_problematic) = value
+
     @property
     def metal_summary(self):
         """Whether the MetalSite is problematic or not."""
 
-        _summary = {"metal": str(self.species[0]),
+        _summary = {"metal": self.species[0],
                     "type": self.metal_type,
                     "is_open": self.is_open,
                     "unique": self.is_unique,
@@ -429,29 +826,37 @@ class MetalSite(MofStructure):
                     "number_of_linkers": self.num_linkers,
                     "min_dihedral": 0.0,
                     "all_dihedrals": 0.0,
-                    't_factor': self._t_factor}
+                    't_factor': self._t_factor,
+                    'cs_hash': self.cs_hash}
 
         return _summary
 
     def keep_valid_bonds(self):
         """Loop over atoms in the coordination sphere and remove any extraneous
         sites.
+
+        The pairs of ligands are visited in order and for every invalid pair
+        whose atoms have not been removed yet, the atom furthest from the
+        metal is removed. The ligand distances are computed only once.
         """
         if len(self) == 0:
             return
         all_dists = self.lattice.get_all_distances(self.frac_coords,
                                                    self.frac_coords)
-        for i, j in itertools.combinations(range(1, len(self)), 2):
-            assert all_dists[i][j] == all_dists[j][i]
-            dis = all_dists[i][j]
-            if not self._valid_pair(i, j, dis):
-                dist_ij_c = [all_dists[i][0], all_dists[j][0]]
-                if len(set(dist_ij_c)) == 1:
-                    index_to_remove = i
-                else:
-                    index_to_remove = [i, j][dist_ij_c.index(max(dist_ij_c))]
-                self.remove_sites([index_to_remove])
-                return self.keep_valid_bonds()
+        invalid = ~self._valid_pairs(all_dists)
+        invalid[0, :] = False
+        keep = np.ones(len(self), dtype=bool)
+        for i, j in zip(*np.nonzero(np.triu(invalid, 1))):
+            if not (keep[i] and keep[j]):
+                continue
+            dist_ij_c = [all_dists[i][0], all_dists[j][0]]
+            if len(set(dist_ij_c)) == 1:
+                index_to_remove = i
+            else:
+                index_to_remove = [i, j][dist_ij_c.index(max(dist_ij_c))]
+            keep[index_to_remove] = False
+        if not keep.all():
+            self.remove_sites(np.flatnonzero(~keep))
 
     def center_around_metal(self):
         """Shift atoms across periodic boundary conditions to have the
@@ -461,32 +866,32 @@ class MetalSite(MofStructure):
         gc = self.lattice.get_cartesian_coords
         center = self.frac_coords[0]
         center_cart_coords = gc(center)
-        for i in range(1, self.num_sites):
-            c_i = self.frac_coords[i]
-            dist_vector = center - c_i
-            dist_vector_r = []
-            for j in range(0, 3):
-                dist_vector_r.append(round(dist_vector[j]))
-            dist_before = np.linalg.norm(center_cart_coords - gc(c_i))
-            c_i_centered = c_i + dist_vector_r
-            dist_after = np.linalg.norm(center_cart_coords - gc(c_i_centered))
-            if dist_after > dist_before:
-                for j in range(0, 3):
-                    dist_vector_r[j] = np.rint(dist_vector[j])
-                c_i_centered = c_i + dist_vector_r
-                if dist_after > dist_before:
-                    c_i_centered = c_i
-            self.replace(i, self.species[i], c_i_centered)
-
-    def check_if_open(self):
+        c_i = self.frac_coords[1:]
+        c_i_centered = c_i + np.round(center - c_i)
+        dist_before = np.linalg.norm(center_cart_coords - gc(c_i), axis=1)
+        dist_after = np.linalg.norm(center_cart_coords - gc(c_i_centered),
+                                    axis=1)
+        # Keep the original position if shifting moves the atom away.
+        moved_away = (dist_after > dist_before)[:, np.newaxis]
+        self.frac_coords[1:] = np.where(moved_away, c_i, c_i_centered)
+        self._cart_coords = None
+
+    def check_if_open(self, cache=None):
         """Get t-factor, check if problematic based on number of linkers and
          if necessary call to check the dihedrals to determine if the metal site
          is open.
+
+        :param cache: SiteCache holding the results for previously seen
+        coordination spheres, if None the site is always checked.
+        (default: None)
          """
+        if cache is not None:
+            cache.check_if_open(self)
+            return
 
         self.get_t_factor()
 
-        if Atom(str(self.species[0])).is_lanthanide_or_actinide:
+        if Atom.get(self.species[0]).is_lanthanide_or_actinide:
             self._is_problematic = self.num_linkers < 5
         else:
             self._is_problematic = self.num_linkers < 3
@@ -509,38 +914,69 @@ class MetalSite(MofStructure):
         metals, if not the value of -1 is assigned.
         """
         nl = self.num_sites - 1
-        index_range = range(1, self.num_sites)
-        all_angles = []
-        for i in itertools.combinations(index_range, 2):
-            angle = self.get_angle(i[0], 0, i[1])
-            all_angles.append([angle, i[0], i[1]])
-
-        all_angles.sort(key=lambda x: x[0])
+        if nl not in (4, 5, 6):
+            self._t_factor = -1
+            return
+        angles, pairs = self._ligand_angles()
+        # Sort the angles keeping the order of the ligand pairs for ties.
+        order = np.argsort(angles, kind='stable')
+        angles = angles[order]
+        pairs = pairs[order]
         if nl == 5 or nl == 4:
             # beta is the largest angle and alpha is the second largest angle
             # in the coordination sphere; using the same convention
             # as Yang et al. DOI: 10.1039/b617136b
-            beta = all_angles[-1][0]
-            alpha = all_angles[-2][0]
+            beta = float(angles[-1])
+            alpha = float(angles[-2])
             if nl == 4:
                 tau = self.get_t4_factor(alpha, beta)
             else:
                 tau = self.get_t5_factor(alpha, beta)
         elif nl == 6:
-            max_indices_all = all_angles[-1][1:3]
-            l3_l4_angles = [x for x in all_angles if
-                            x[1] not in max_indices_all and
-                            x[2] not in max_indices_all]
-            max_indices_all_3_4 = max(l3_l4_angles, key=lambda x: x[0])[1:3]
-            l5_l6_angles = [x for x in l3_l4_angles
-                            if x[1] not in max_indices_all_3_4 and
-                            x[2] not in max_indices_all_3_4]
-            gamma = max(l5_l6_angles, key=lambda x: x[0])[0]
+            max_indices_all = pairs[-1]
+            l3_l4 = ~self._shares_ligand(pairs, max_indices_all)
+            l3_l4_i = np.flatnonzero(l3_l4)
+            max_indices_all_3_4 = pairs[l3_l4_i[np.argmax(angles[l3_l4])]]
+            l5_l6 = l3_l4 & ~self._shares_ligand(pairs, max_indices_all_3_4)
+            gamma = float(angles[l5_l6].max())
             tau = self.get_t6_factor(gamma)
-        else:
-            tau = -1
         self._t_factor = tau
 
+    def _ligand_angles(self):
+        """Compute all the ligand-metal-ligand angles of the MetalSite.
+
+        :return: The angles in degrees and the indices of the two ligands
+        forming each angle, in itertools.combinations order.
+        """
+        coords = self.cart_coords
+        vectors = coords[1:] - coords[0]
+        pairs = self._ligand_pairs(len(vectors))
+        i, j = pairs[:, 0] - 1, pairs[:, 1] - 1
+        gram = vectors @ vectors.T
+        norms = np.sqrt(np.diag(gram))
+        d = np.clip(gram[i, j] / norms[i] / norms[j], -1.0, 1.0)
+        # math.acos keeps the angles identical to pymatgen's get_angle, the
+        # numpy version can differ in the last digit.
+        angles = np.degrees([math.acos(x) for x in d])
+        return angles, pairs
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _ligand_pairs(num_linkers):
+        """All pairs of ligand indices, in itertools.combinations order. The
+        array is shared by all the sites with the same number of ligands, so
+        it is read-only.
+        """
+        pairs = np.array(list(itertools.combinations(
+            range(1, num_linkers + 1), 2)))
+        pairs.flags.writeable = False
+        return pairs
+
+    @staticmethod
+    def _shares_ligand(pairs, pair):
+        """Check which of the ligand pairs contain a ligand of pair."""
+        return (pairs[:, :, np.newaxis] == pair).any(axis=(1, 2))
+
     @staticmethod
     def get_t4_factor(a, b):
         return (360 - (a + b)) / 141.0
@@ -560,182 +996,243 @@ class MetalSite(MofStructure):
         Helper.make_folder(output_folder)
         output_fname = output_folder
         output_fname += '/first_coordination_sphere'+str(index)+'.cif'
-        self.to(filename=output_fname)
+        self.to_structure().to(filename=output_fname)
 
-    def _valid_pair(self, i, j, dis):
-        """Determine whether two atoms in the coordination sphere form a valid
-        pair.
+    def _valid_pairs(self, all_dists):
+        """Determine which pairs of atoms in the coordination sphere form a
+        valid pair.
 
         A pair is not valid if it forms a bond unless both atoms are metals of
         the same kind as the center or both atoms are carbon atoms (e.g. in the
         case of a ferocene type coordination sphere).
 
-        :param i:
-        :param j:
-        :param dis:
-        :return:
+        :param all_dists: Distances between all the atoms in the coordination
+        sphere.
+        :return: Boolean matrix, True for the pairs that are valid.
         """
-        s_one = str(self.species[i])
-        s_two = str(self.species[j])
-        a_one = Atom(s_one)
-        a_two = Atom(s_two)
+        unique_species, species_ids = np.unique(self.species,
+                                                return_inverse=True)
+        max_bonds = max_bond_matrix(unique_species)[species_ids][:,
+                                                                 species_ids]
+        bond = all_dists < max_bonds
 
-        bond = a_one.check_bond(s_two, dis, a_one.bond_tolerance(s_two))
+        species = np.array(self.species)
+        same_atoms = ((species[:, np.newaxis] == species[np.newaxis, :])
+                      & (species == self.species[0])[:, np.newaxis])
+        two_same_metals = same_atoms & Atom.get(self.species[0]).is_metal
 
-        same_atoms = s_one == s_two == str(self.species[0])
-        two_same_metals = same_atoms and a_one.is_metal and a_two.is_metal
+        carbon = species == 'C'
+        carbon_atoms = carbon[:, np.newaxis] & carbon[np.newaxis, :]
 
-        carbon_atoms = s_one == s_two == 'C'
-
-        return (not bond) or two_same_metals or carbon_atoms
+        return ~bond | two_same_metals | carbon_atoms
 
     def _check_planes(self, site):
         """Determine whether a site is open using the dihedral angles
         between the atoms in the coordination sphere.
+
+        The planes defined by all triplets of atoms are evaluated at once and
+        the site is marked using the first plane, in itertools.combinations
+        order, for which it is found to be open.
         :param site: Index of site to be checked.
         """
-
-        for i, j, k in itertools.combinations(range(self.num_sites), 3):
-            plane = self._compute_plane(i, j, k)
-            if all([abs(p-0.0) < 1e-5 for p in plane]):
-                continue
-            sides = self._sides([i, j, k], plane)
-            # Side of the site in question.
-            s_site = sides[site]
-            # All sites that are not on the plane and are not the site in
-            # question.
-            s_o = [s for i, s in enumerate(sides) if i != site and s != 0]
-            # Keep only the unique sides
-            s_o_unique = list(set(s_o))
-            # Number of unique sides for other sites (sites not on plane and
-            # not the site in question)
-            ls = len(s_o_unique)
-            # ls = 0 : all other sites are on the plane
-            # ls = 1 : all other sites on one side of plane
-            # ls = 2 : other sites are on both sides of plane
-            if ls == 0 or (ls == 1 and s_site != s_o_unique[0]):
-                # Site is open if:
-                # a) If all other sites fall on the plane. (ls == 0)
-                # b) The metal site falls on the plane and all other sites
-                # fall on one side of the plane. (ls == 1, s_site == 0 and
-                # s_site != s_o_unique[0])
-                # c) The metal site falls on one side of the plane and all
-                # other sites fall on the oposite side of the plane.  (ls == 1,
-                # s_site == 1,-1 and s_site != s_o_unique[0])
-                place = {0: "over", 1: "on"}[abs(s_site)]
-                msg = "{}_{}L_{}_open_plane".format(self[site].specie,
-                                                    self.num_linkers, place)
-                self._mark_oms(msg)
-                break
-            assert self.is_open is False
-
-    def _sides(self, p_i, plane):
-        """Given a plane p defined by 3 of the atoms in the MetalSite determine
-        on which side of the plane all the atoms in the MetalSite fall (-1 or 1)
-        or if it falls on the plane (0).
-
-        :param p_i: Indices of the 3 atoms that define the plane
-        :param plane: Plane constants
-        :return: List of side value for all atoms in the MetalSite, possible
-        values can -1, 0, and 1.
-        """
-        atoms_on_plane = [True if i in p_i
-                          else self._is_point_on_plane(self[i].coords, p_i,
-                                                       plane)
-                          for i in range(len(self))]
-
-        dists = [self._get_distance_from_plane(s.coords, plane) for s in self]
-        sides = [0 if a or d == 0.0
-                 else int(d/abs(d))
-                 for d, a in zip(dists, atoms_on_plane)]
+        coords = self.cart_coords
+        triplets = np.array(list(itertools.combinations(range(self.num_sites),
+                                                        3)))
+        normals, constants = self._compute_planes(coords, triplets)
+        planes = np.column_stack((normals, constants))
+        valid = ~np.all(np.abs(planes) < 1e-5, axis=1)
+        triplets = triplets[valid]
+        normals = normals[valid]
+        constants = constants[valid]
+
+        sides = self._sides(coords, triplets, normals, constants)
+        # Side of the site in question.
+        s_site = sides[:, site]
+        # All sites that are not the site in question, sites on the plane
+        # are ignored.
+        s_o = np.delete(sides, site, axis=1)
+        above = np.any(s_o == 1, axis=1)
+        below = np.any(s_o == -1, axis=1)
+        # Number of unique sides for other sites (sites not on plane and
+        # not the site in question)
+        # ls = 0 : all other sites are on the plane
+        # ls = 1 : all other sites on one side of plane
+        # ls = 2 : other sites are on both sides of plane
+        ls = above.astype(int) + below.astype(int)
+        s_o_unique = np.where(above, 1, -1)
+        # Site is open if:
+        # a) If all other sites fall on the plane. (ls == 0)
+        # b) The metal site falls on the plane and all other sites
+        # fall on one side of the plane. (ls == 1, s_site == 0 and
+        # s_site != s_o_unique[0])
+        # c) The metal site falls on one side of the plane and all
+        # other sites fall on the oposite side of the plane.  (ls == 1,
+        # s_site == 1,-1 and s_site != s_o_unique[0])
+        is_open = (ls == 0) | ((ls == 1) & (s_site != s_o_unique))
+        open_planes = np.flatnonzero(is_open)
+        if len(open_planes) > 0:
+            place = {0: "over", 1: "on"}[abs(int(s_site[open_planes[0]]))]
+            msg = "{}_{}L_{}_open_plane".format(self.species[site],
+                                                self.num_linkers, place)
+            self._mark_oms(msg)
+
+    def _sides(self, coords, triplets, normals, constants):
+        """Given planes defined by 3 of the atoms in the MetalSite determine
+        on which side of each plane all the atoms in the MetalSite fall (-1 or
+        1) or if they fall on the plane (0).
+
+        :param coords: Cartesian coordinates of the atoms in the MetalSite.
+        :param triplets: Indices of the 3 atoms that define each plane.
+        :param normals: Normal vectors of the planes.
+        :param constants: Plane constants.
+        :return: Array of side values with one row per plane and one column
+        per atom in the MetalSite, possible values can -1, 0, and 1.
+        """
+        on_plane = self._points_on_planes(coords, triplets, normals,
+                                          constants)
+        rows = np.arange(len(triplets))[:, np.newaxis]
+        on_plane[rows, triplets] = True
+        dists = self._get_distances_from_planes(coords, normals, constants)
+        sides = np.sign(dists).astype(int)
+        sides[on_plane] = 0
         return sides
 
-    def _is_point_on_plane(self, point, p_i, p):
-        """Given a point and plane determine if the point falls on the plane,
-        using the angle between the projection of the point, each atom on the
-        plane and the actual position of the point with a specified tolerance
-        value.
-        :param point: Cartesian coordinates of point to check.
-        :param p: plane in the form of a list with the 4 constants defining
-        a plane.
-        :return: True if the point falls on plane and False otherwise.
-
+    def _points_on_planes(self, coords, triplets, normals, constants):
+        """Given points and planes determine if each point falls on each
+        plane, using the angle between the projection of the point, each atom
+        on the plane and the actual position of the point with a specified
+        tolerance value.
+        :param coords: Cartesian coordinates of the points to check.
+        :param triplets: Indices of the 3 atoms that define each plane.
+        :param normals: Normal vectors of the planes.
+        :param constants: Plane constants.
+        :return: Boolean array with one row per plane and one column per
+        point, True if the point falls on the plane and False otherwise.
         """
         tol = self.tolerance['on_plane']
-        point_on_plane = self._project_point_onto_plane(point, p)
-        angles = [self._get_angle_c(point_on_plane, self[ii].coords, point)
-                  for ii in p_i]
-        return all([a < tol for a in angles])
-
-    def _get_angle_c(self, c1, c2, c3):
-        """
-        Calculates the angle between three points in degrees.
-
-        :param c1: Coordinates of first point.
-        :param c2: Coordinates of second point.
-        :param c3: Coordinates of third point.
-        :return: Angle between them in degrees.
-        """
-        v1 = c1 - c2
-        v2 = c3 - c2
-        return self._get_angle_v(v1, v2)
+        projections = self._project_points_onto_planes(coords, normals,
+                                                       constants)
+        on_plane = np.ones(projections.shape[:2], dtype=bool)
+        for corner in range(3):
+            c2 = coords[triplets[:, corner]][:, np.newaxis, :]
+            angles = self._get_angles_v(projections - c2,
+                                        coords[np.newaxis, :, :] - c2)
+            on_plane &= angles < tol
+        return on_plane
 
     @staticmethod
-    def _get_angle_v(v1, v2):
+    def _get_angles_v(v1, v2):
         """
-        Calculates the angle between two vectors in degrees.
+        Calculates the angles between two arrays of vectors in degrees.
 
-        :param v1: First vector.
-        :param v2: Second vector.
-        :return: Angle between them in degrees.
+        :param v1: First vectors, the last axis holds the components.
+        :param v2: Second vectors, the last axis holds the components.
+        :return: Angles between them in degrees.
         """
-        if np.dot(v1, v2) == 0.0:
-            return 0.0
-        d = np.dot(v1, v2) / np.linalg.norm(v1) / np.linalg.norm(v2)
-        d = min(d, 1.0)
-        d = max(d, -1.0)
-        angle = math.acos(d)
-        return math.degrees(angle)
+        dot = np.sum(v1 * v2, axis=-1)
+        norms = (np.sqrt(np.sum(v1 * v1, axis=-1))
+                 * np.sqrt(np.sum(v2 * v2, axis=-1)))
+        perpendicular = dot == 0.0
+        d = dot / np.where(perpendicular, 1.0, norms)
+        d = np.clip(d, -1.0, 1.0)
+        angles = np.degrees(np.arccos(d))
+        angles[perpendicular] = 0.0
+        return angles
 
     @staticmethod
-    def _get_distance_from_plane(point, plane):
-        """Given a point and a plane compute the distance between the point and
-        the projection of the point on the plane."""
-        plane_xyz = plane[0:3]
-        distance = np.inner(plane_xyz, point) - plane[3]
-        return distance / np.linalg.norm(plane_xyz)
-
-    def _compute_plane(self, i, j, k):
-        """Given three atom indices, compute the plane that passes through them.
-        """
-        c1 = self[i].coords
-        c2 = self[j].coords
-        c3 = self[k].coords
-        return self._compute_plane_c(c1, c2, c3)
+    def _get_distances_from_planes(coords, normals, constants):
+        """Given points and planes compute the distance between each point and
+        its projection on each plane."""
+        distances = normals @ coords.T - constants[:, np.newaxis]
+        norms = np.sqrt(np.sum(normals * normals, axis=1))
+        return distances / norms[:, np.newaxis]
 
     @staticmethod
-    def _compute_plane_c(c1, c2, c3):
-        """Given three atom coordinates, compute the plane that passes
-        through them.
+    def _compute_planes(coords, triplets):
+        """Given atom coordinates and triplets of atom indices, compute the
+        planes that pass through each triplet.
+
+        :return: The normal vectors and constants of the planes.
         """
+        c1 = coords[triplets[:, 0]]
+        c2 = coords[triplets[:, 1]]
+        c3 = coords[triplets[:, 2]]
         ij = c1 - c2
         kj = c3 - c2
-        p_vector = np.cross(ij, kj)
-        c = np.dot(c1, p_vector)
-        plane = list(p_vector) + [c]
-        return plane
+        normals = np.cross(ij, kj)
+        constants = np.sum(c1 * normals, axis=1)
+        return normals, constants
 
     @staticmethod
-    def _project_point_onto_plane(point, plane):
-        """Given a point and plane compute the projection of the point onto the
-        plane.
+    def _project_points_onto_planes(coords, normals, constants):
+        """Given points and planes compute the projection of each point onto
+        each plane.
+        """
+        nom = normals @ coords.T - constants[:, np.newaxis]
+        denom = np.sum(normals * normals, axis=1)
+        const = nom / denom[:, np.newaxis]
+        return (coords[np.newaxis, :, :]
+                - normals[:, np.newaxis, :] * const[:, :, np.newaxis])
+
+
+class StageTimer:
+    """Record the wall time spent in the stages of an analysis and the change
+    in the resident memory of the process during each stage.
+
+    Stages can be nested, the time and memory change of a nested stage are
+    not counted in the stage around it. A stage entered several times, e.g.
+    once for every metal site, adds up its time and memory change. When the
+    timer is not enabled stage does nothing.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.timings = {}
+        self._nested = []
+
+    def stage(self, name):
+        """Context manager timing a stage.
+
+        :param name: Name of the stage.
         """
-        vector = plane[0:3]
-        constant = plane[3]
-        nom = np.inner(vector, point) - constant
-        denom = np.inner(vector, vector)
-        const = nom / denom
-        return np.array([po - v * const for po, v in zip(point, vector)])
+        if not self.enabled:
+            return _NO_STAGE
+        return self._timed_stage(name)
+
+    @contextlib.contextmanager
+    def _timed_stage(self, name):
+        # Time and memory change of the stages nested in this one.
+        self._nested.append([0.0, 0.0])
+        t0 = time.perf_counter()
+        rss0 = self.rss_mb()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            rss = self.rss_mb()
+            change = None if rss is None or rss0 is None else rss - rss0
+            nested_time, nested_change = self._nested.pop()
+            if self._nested:
+                self._nested[-1][0] += elapsed
+                self._nested[-1][1] += change or 0.0
+            record = self.timings.setdefault(
+                name, {'time': 0.0, 'calls': 0, 'rss_change_mb': None})
+            record['time'] += elapsed - nested_time
+            record['calls'] += 1
+            if change is not None:
+                record['rss_change_mb'] = ((record['rss_change_mb'] or 0.0)
+                                           + change - nested_change)
+
+    @staticmethod
+    def rss_mb():
+        """Current resident memory of the process in MB, read from
+        /proc/self/statm, None if it cannot be found on this platform."""
+        try:
+            with open('/proc/self/statm') as statm:
+                pages = int(statm.read().split()[1])
+            return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+        except (OSError, AttributeError, ValueError, IndexError):
+            return None
 
 
 class Helper:
@@ -761,7 +1258,9 @@ class Helper:
             shutil.copytree(src, d)
 
     @classmethod
-    def get_checksum(cls, filename):
+    def get_checksum(cls, filename, block_size=1 << 20):
+        sha256 = hashlib.sha256()
         with open(filename, 'rb') as f:
-            file = f.read()
-        return hashlib.sha256(file).hexdigest()
+            for block in iter(lambda: f.read(block_size), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
@@ -3,17 +3,23 @@ import os
 import glob
 import json
 import time
-import pickle
 import shutil
 import random
+import heapq
 import warnings
 import pandas as pd
 import numpy as np
 import matplotlib.pylab as plt
-from multiprocessing import Process, cpu_count, Array
+from multiprocessing import cpu_count
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import as_completed
 from omsdetector_forked.mof import Helper
 from omsdetector_forked.mof import MofStructure
 from omsdetector_forked.atomic_parameters import Atom
+from omsdetector_forked.property_store import PropertyStore
+from omsdetector_forked.cif_reader import count_cif_atoms
+from omsdetector_forked.result_store import ResultStore
+from omsdetector_forked.site_cache import shared_site_cache
 from sys import exit
 pd.options.display.max_rows = 1000
 
@@ -23,21 +29,34 @@ class MofCollection:
 
     separator = "".join(['-'] * 50)
 
-    def __init__(self, path_list, analysis_folder='analysis_folder'):
+    def __init__(self, path_list, analysis_folder='analysis_folder',
+                 fast_cif_reader=False, mof_coll=None):
         """Create a MofCollection from a list of path names.
 
         :param path_list: List of paths to MOF CIF files to be added to the
         collection.
         :param analysis_folder: Path to the folder where the results will
         be stored. (default: 'analysis_folder')
+        :param fast_cif_reader: Read P1 CIF files with the fast NumPy reader
+        instead of the pymatgen CIF parser, other files are still read with
+        pymatgen. (default: False)
+        :param mof_coll: Names, paths and checksums of the CIF files in
+        path_list, as in the mof_coll of another collection using the same
+        analysis folder. If set the CIF files are not read to compute their
+        checksums. (default: None)
         """
         self._analysis_folder = analysis_folder
+        self.fast_cif_reader = fast_cif_reader
         self.path_list = path_list
         self.mof_coll = []
         self.batches = []
+        self.batch_loads = []
         self._metal_site_df = None
         self._mof_oms_df = None
-        self._properties = {}
+        self._df_checksums = {}
+        self._properties = None
+        self._filter_table = None
+        self._result_store = None
         self.load_balance_index = {}
         self.analysis_limit = None
 
@@ -52,7 +71,10 @@ class MofCollection:
             "mof_name": self._apply_value_in_filter
         }
 
-        self._load_mofs()
+        if mof_coll is None:
+            self._load_mofs()
+        else:
+            self.mof_coll = mof_coll
 
     def __len__(self):
         return len(self.mof_coll)
@@ -100,87 +122,64 @@ class MofCollection:
 
     @property
     def _properties_filename(self):
-        """Get value of the properties pickle file."""
+        """Get value of the properties database file."""
+        return self.analysis_folder + '/properties.sqlite'
+
+    @property
+    def _site_cache_filename(self):
+        """Get value of the metal site classification cache file."""
+        return self.analysis_folder + '/site_cache.sqlite'
+
+    @property
+    def _properties_pickle_filename(self):
+        """Get value of the properties pickle file used by older versions."""
         return self.analysis_folder + '/properties.pickle'
 
     @property
     def properties(self):
-        """Get value for the MOF properties. If the property variable is not
-        None and the pickle file exists, then load the file and return it."""
-        if not self._properties and os.path.isfile(self._properties_filename):
-            with open(self._properties_filename, 'rb') as properties_file:
-                self._properties = pickle.load(properties_file)
+        """Get the MOF properties store of the analysis folder. If the store
+        is not open yet, open it and import any properties from an older
+        properties pickle file. If the analysis folder has changed, the
+        properties are copied to the store of the new folder."""
+        filename = os.path.abspath(self._properties_filename)
+        if self._properties is None or self._properties.filename != filename:
+            store = PropertyStore(filename)
+            store.migrate_pickle(self._properties_pickle_filename)
+            if self._properties is not None:
+                self._properties.copy_to(store)
+                self._properties.close()
+            self._properties = store
         return self._properties
 
+    @property
+    def result_store(self):
+        """Get the store of OMS results written in the npz output format."""
+        folder = os.path.abspath(self.oms_results_folder)
+        if self._result_store is None or self._result_store.folder != folder:
+            self._result_store = ResultStore(folder)
+        return self._result_store
+
     @property
     def mof_oms_df(self):
         """Get a pandas DataFrame that lists for each MOF whether it has an OMS
-        or not and if it has an OMS what metal types it is.
+        or not and if it has an OMS what metal types it is. While the analysis
+        is running it holds the MOFs analysed so far, and the MOFs analysed
+        since are added the next time it is used.
         """
-        if self._mof_oms_df is not None:
-            return self._mof_oms_df
-        if not self._validate_properties(['has_oms'])[1]:
-            print('OMS analysis not finished for all MOFs in collection.')
-            return False
-        mof_info = {}
-        for mi in self.mof_coll:
-            mp = self.properties[mi['checksum']]
-            if 'metal_sites' not in mp:
-                continue
-            metal_sites = mp['metal_sites']
-            if len(metal_sites) == 0:
-                print('No Metal Found in {}'.format(mp['name']))
-            oms_types = [ms["metal"] for ms in metal_sites
-                         if ms["is_open"] and ms["unique"]]
-            oms_types = list(set(oms_types))
-            if oms_types:
-                oms_types = ",".join(oms_types)
-            else:
-                oms_types = "N/A"
-            if mp['has_oms']:
-                has_oms = 'Yes'
-            else:
-                has_oms = 'No'
-            all_metal_species = ",".join(set(mp['metal_species']))
-            mof_info[mp['name']] = {'Metal Types': all_metal_species,
-                                    'Has OMS': has_oms,
-                                    'OMS Types': oms_types}
-        self._metal_site_df = pd.DataFrame.from_dict(mof_info,
-                                                     orient='index')
-        return self._metal_site_df
+        return self._update_results_df('_mof_oms_df', self._mof_oms_rows)
 
     @property
     def metal_site_df(self):
         """Get a pandas DataFrame that lists the OMS results for each metal
-        type.
+        type. While the analysis is running it holds the MOFs analysed so far,
+        and the MOFs analysed since are added the next time it is used.
         """
-        if self._metal_site_df is not None:
-            return self._metal_site_df
-        if not self._validate_properties(['has_oms'])[1]:
-            print('OMS analysis not finished for all MOFs in collection.')
-            return False
-        site_info = {}
-        for mi in self.mof_coll:
-            mp = self.properties[mi['checksum']]
-            if 'metal_sites' not in mp:
-                continue
-            metal_sites = mp['metal_sites']
-            if len(metal_sites) == 0:
-                print('No Metal Found in {}'.format(mp['name']))
-            for i, ms in enumerate(metal_sites):
-                key = mp['name'] + '_' + str(i)
-                site_info[key] = ms
-                if 'all_dihedrals' in ms:
-                    del site_info[key]['all_dihedrals']
-                if 'min_dihedral' in ms:
-                    del site_info[key]['min_dihedral']
-                site_info[key]['mof_name'] = mp['name']
-        self._metal_site_df = pd.DataFrame.from_dict(site_info, orient='index')
-        return self._metal_site_df
+        return self._update_results_df('_metal_site_df',
+                                       self._metal_site_rows)
 
     @classmethod
     def from_folder(cls, collection_folder, analysis_folder='analysis_folder',
-                    name_list=None):
+                    name_list=None, fast_cif_reader=False):
         """Create a MofCollection from a the CIF files in a folder.
 
         :param collection_folder: Path to the folder containing the CIF files to
@@ -190,6 +189,8 @@ class MofCollection:
         :param name_list: List of MOF names to include in the collection. If
         set, all the other CIF files in the folder will be excluded.
         (default: None)
+        :param fast_cif_reader: Read P1 CIF files with the fast NumPy reader
+        instead of the pymatgen CIF parser. (default: False)
         :return: A MofCollection object holding the specified MOF structures.
         """
 
@@ -201,63 +202,194 @@ class MofCollection:
             path_list = [d+'/'+name for name in name_list]
         else:
             path_list = glob.glob(collection_folder + "/*.cif")
-        return cls(path_list, analysis_folder)
+        return cls(path_list, analysis_folder, fast_cif_reader)
 
-    def analyse_mofs(self, overwrite=False, num_batches=1, analysis_limit=None):
-        """Run OMS analysis for the MOFs in the collection.
+    def analyse_mofs(self, overwrite=False, num_batches=1, analysis_limit=None,
+                     max_workers=None, chunk_size=1, output_format='json',
+                     output_policy='full', shard_size=1000,
+                     use_symmetry=False, symprec=0.01, site_cache=False,
+                     site_cache_strict=False, timings=False):
+        """Run OMS analysis for the MOFs in the collection. To process the
+        results while the analysis is running use iter_results instead.
+
+        The MOFs are handed to a pool of worker processes largest first,
+        according to their load balancing index, and idle workers pick up the
+        next chunk of MOFs until all of them are analyzed.
 
         :param overwrite: Controls if the results will be overwritten or not
         (default: False)
         :param num_batches: Sets the number of batches the structures will be
-        split in and analyzed on a separate process. (default: 1)
+        split in, also the number of worker processes if max_workers is not
+        set. (default: 1)
         :param analysis_limit: Analyze only up to the number of MOFs set by
         analysis_limit, if set to None all MOFs will be analyzed (default: None)
+        :param max_workers: Number of worker processes, if set to None
+        num_batches processes are used. (default: None)
+        :param chunk_size: Number of MOFs handed to a worker at a time.
+        (default: 1)
+        :param output_format: 'json' to write a folder with a JSON file and
+        CIF files for every MOF, or 'npz' to append the results to compressed
+        NumPy shards in the OMS results folder. CIF files for results in the
+        npz format can be written later with export_results.
+        (default: 'json')
+        :param output_policy: Which results are kept besides the summary.
+        'summary' keeps only the summary, 'spheres' also keeps the
+        coordination spheres and 'full' also the CIF files of the metal and
+        non-metal parts of the MOF, which are not kept in the npz format.
+        (default: 'full')
+        :param shard_size: Number of MOFs written to each npz shard.
+        (default: 1000)
+        :param use_symmetry: Analyze only one metal site of every set of
+        symmetry equivalent metal sites in each MOF, see
+        MofStructure.analyze_metals. (default: False)
+        :param symprec: Tolerance used to find the symmetry if use_symmetry
+        is set. (default: 0.01)
+        :param site_cache: Reuse the classification of coordination spheres
+        with the same local environment, within and across MOFs. The
+        classifications are stored in site_cache.sqlite in the analysis
+        folder, shared by all worker processes and kept for later runs.
+        (default: False)
+        :param site_cache_strict: Check every classification taken from the
+        site cache against a new one and report any difference.
+        (default: False)
+        :param timings: Record the wall time and memory of every stage of
+        the analysis of each MOF in its summary, see timing_report.
+        (default: False)
         """
-        print(self.separator)
-        print("Running OMS Analysis...")
-        self.analysis_limit = analysis_limit
-
         t0 = time.time()
-
-        self._make_batches(num_batches, overwrite)
-
-        status = Array('i', [0 for i in range(num_batches)])
-        for i, batch in enumerate(self.batches):
-            p = Process(target=self._run_batch,
-                        args=(i, batch, overwrite,status))
-            p.start()
-
-        lbs = [len(batch)/100.0 for batch in self.batches]
-        wait_time = 0.0
-        status_prev = [0 for i in range(num_batches)]
-        while True:
-            # Create a list from the shared array to make sure it doesnt change
-            # during the iteration
-            status_ = list(status)
-            if all([sp == s for sp, s in zip(status_prev, status_)]):
-                wait_time = min(25, 0.1+wait_time)
-                time.sleep(wait_time)
-            status_prev = status_
-
-            sout = ["Batch {} Finished.".format(b + 1)
-                    if len(self.batches[b]) == 0 or s < 0 else
-                    "Batch {} {:.2f} % : Analysing {:}"
-                    "".format(b+1, (s+1)/lbs[b], self.batches[b][s]['mof_name'])
-                    for b, s in enumerate(status_)]
-            print("|**| ".join(sout) + 100 * " ", end='\r', flush=True)
-
-            if all([s < 0 for s in status_]):
-                break
-
-        if overwrite:
-            for mi in self.mof_coll:
-                self._update_property_from_oms_result(mi)
+        for _ in self._run_analysis(overwrite, num_batches, analysis_limit,
+                                    max_workers, chunk_size, output_format,
+                                    output_policy, shard_size, use_symmetry,
+                                    symprec, site_cache, site_cache_strict,
+                                    timings):
+            pass
         self._validate_properties(['has_oms'])
 
         t1 = time.time()
         print('\nAnalysis Finished. Time required:{:.2f} sec'.format(t1 - t0))
         print(self.separator)
 
+    def iter_results(self, overwrite=False, num_batches=1, analysis_limit=None,
+                     max_workers=None, chunk_size=1, output_format='json',
+                     output_policy='full', shard_size=1000,
+                     use_symmetry=False, symprec=0.01, site_cache=False,
+                     site_cache_strict=False, timings=False):
+        """Run OMS analysis for the MOFs in the collection, as analyse_mofs
+        does, and yield the summary of each MOF as soon as a worker has
+        analyzed it. The properties of the MOF are updated before its summary
+        is yielded, so mof_oms_df and metal_site_df can be used in between.
+
+        If the loop is stopped early the MOFs not started yet are cancelled,
+        the MOFs being analyzed are finished and their results are stored
+        with the ones received so far, without being yielded.
+
+        The parameters are the same as for analyse_mofs.
+        :return: Generator of the summaries of the analyzed MOFs, MOFs skipped
+        because their results already exist are not included.
+        """
+        for mi, summary in self._run_analysis(
+                overwrite, num_batches, analysis_limit, max_workers,
+                chunk_size, output_format, output_policy, shard_size,
+                use_symmetry, symprec, site_cache, site_cache_strict,
+                timings):
+            if summary is not None:
+                yield summary
+
+    def _run_analysis(self, overwrite, num_batches, analysis_limit,
+                      max_workers, chunk_size, output_format, output_policy,
+                      shard_size, use_symmetry, symprec, site_cache,
+                      site_cache_strict, timings):
+        """Run OMS analysis for the MOFs in the collection and yield a
+        (mof_info, summary) tuple for each MOF as the workers finish them,
+        the summary is None if the MOF was not analyzed. The properties are
+        written to the properties store every shard_size MOFs and when the
+        analysis stops. See analyse_mofs for the parameters.
+        """
+        if output_format not in ('json', 'npz'):
+            raise ValueError('Unknown output format {}, use \'json\' or '
+                             '\'npz\''.format(output_format))
+        MofStructure._check_output_policy(output_policy)
+        print(self.separator)
+        print("Running OMS Analysis...")
+        self.analysis_limit = analysis_limit
+        if max_workers is None:
+            max_workers = num_batches
+
+        self._make_batches(num_batches, overwrite)
+
+        tasks = [mi for batch in self.batches for mi in batch]
+        tasks.sort(key=lambda mi:
+                   self.properties[mi['checksum']]['load_balancing_index'],
+                   reverse=True)
+        chunks = [tasks[i:i + chunk_size]
+                  for i in range(0, len(tasks), chunk_size)]
+
+        store = self.result_store
+        store.shard_size = shard_size
+        site_cache_file = None
+        if site_cache:
+            site_cache_file = os.path.abspath(self._site_cache_filename)
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+        pending = set()
+        results = []
+        try:
+            futures = [executor.submit(self._analyse_chunk, chunk,
+                                       self.oms_results_folder, overwrite,
+                                       self.fast_cif_reader, output_format,
+                                       output_policy, use_symmetry, symprec,
+                                       site_cache_file, site_cache_strict,
+                                       timings)
+                       for chunk in chunks]
+            done = 0
+            pending = set(futures)
+            for future in as_completed(futures):
+                pending.discard(future)
+                results = list(future.result())
+                while results:
+                    mi, summary, record = results.pop(0)
+                    done += 1
+                    self._store_result(store, mi, summary, record)
+                    if done % shard_size == 0:
+                        self._store_properties()
+                    print("{:.2f} % : Analysed {:}{:100}".format(
+                        100.0 * done / len(tasks), mi['mof_name'], " "),
+                        end='\r', flush=True)
+                    yield mi, summary
+        finally:
+            # Stopping early, e.g. when iter_results is not consumed to the
+            # end, cancels the MOFs that have not been started yet. The
+            # chunks already running are waited for anyway, so their results
+            # are stored along with the rest of the current chunk.
+            for future in pending:
+                future.cancel()
+            for mi, summary, record in results:
+                self._store_result(store, mi, summary, record)
+            for future in pending:
+                if future.cancelled():
+                    continue
+                try:
+                    chunk_results = future.result()
+                except Exception:
+                    continue
+                for mi, summary, record in chunk_results:
+                    self._store_result(store, mi, summary, record)
+            executor.shutdown()
+            store.flush()
+            self._store_properties()
+
+    def _store_result(self, store, mi, summary, record):
+        """Store the results of a MOF received from a worker.
+
+        :param store: ResultStore the npz record is appended to.
+        :param mi: The MOF info of the MOF.
+        :param summary: The summary of the MOF, None if it was not analyzed.
+        :param record: The npz record of the MOF, None for the json format.
+        """
+        if record is not None:
+            store.append(record)
+        if summary is not None:
+            self._update_property_from_summary(mi, summary)
+
     def check_structures(self):
         """Iterate over all the MOFs in the collection and validate that they
         can be read and a MofStructure can be created.
@@ -325,9 +457,7 @@ class MofCollection:
             sample_size = ll
             print(f"Can only sample up to the number of MOFs "
                   f"in the collection ({ll}).")
-        mof_list = [mi['mof_file'] for mi in self.mof_coll]
-        sampled_list = random.sample(mof_list, sample_size)
-        return MofCollection(sampled_list, analysis_folder=self.analysis_folder)
+        return self._sub_collection(random.sample(range(ll), sample_size))
 
     def filter_collection(self, using_filter=None,
                           new_collection_folder=None,
@@ -367,35 +497,41 @@ class MofCollection:
             print(self.separator)
             return
 
-        validation_level, cf = self._validate_properties(using_filter)
-        if validation_level == 1 and not cf:
-            print('Properties from CIF files could not be validated.'
-                  'Check that all CIF files can be read')
-            return
-        elif validation_level == 2 and not cf:
-            print('Requested a filter that needs OMS information but the '
-                  'OMS analysis does not appear to be complete.\n'
-                  'Run it first and try again.')
-            return
+        # Only the MOFs missing some of the properties are validated one by
+        # one, the filters are then applied to the property table at once.
+        table = self._property_table()
+        valid = self._valid_rows(table, list(using_filter))
+        if not valid.all():
+            not_valid = [mi for mi, v in zip(self.mof_coll, valid) if not v]
+            validation_level, cf = self._validate_properties(using_filter,
+                                                             not_valid)
+            if validation_level == 1 and not cf:
+                print('Properties from CIF files could not be validated.'
+                      'Check that all CIF files can be read')
+                return
+            elif validation_level == 2 and not cf:
+                print('Requested a filter that needs OMS information but the '
+                      'OMS analysis does not appear to be complete.\n'
+                      'Run it first and try again.')
+                return
+            table = self._property_table()
 
         print(self.separator)
         print('Filtering collection.')
-        filtered_list = []
-        for i, mi in enumerate(self.mof_coll):
-            mp = self.properties[mi['checksum']]
-            fun = self._apply_filter
-            if all([fun(f, mp[f], using_filter[f]) for f in using_filter]):
-                filtered_list.append(mi['mof_file'])
+        mask = np.ones(len(self.mof_coll), dtype=bool)
+        for f in using_filter:
+            mask &= self._apply_filter(f, table[f],
+                                       using_filter[f]).to_numpy(dtype=bool)
+        filtered = np.flatnonzero(mask)
 
-        found_s = {0: "No", 1: len(filtered_list)}[min(1, len(filtered_list))]
+        found_s = {0: "No", 1: len(filtered)}[min(1, len(filtered))]
         print('\n{} MOFs were matched using the provided'
               ' filter.'.format(found_s))
-        if len(filtered_list) == 0:
+        if len(filtered) == 0:
             print('No collection returned.')
             return None
         print('Returning a new collection using the matched MOFs.')
-        sub_collection = MofCollection(filtered_list,
-                                       analysis_folder=self.analysis_folder)
+        sub_collection = self._sub_collection(filtered)
         print(self.separator)
 
         sub_collection.copy_cifs(new_collection_folder)
@@ -470,15 +606,63 @@ class MofCollection:
         Helper.make_folder(tf_abspath)
         Helper.make_folder(destination_path)
 
+        stored = []
         for i, mi in enumerate(self.mof_coll):
             mof_name = mi['mof_name']
-            if self._check_if_results_exist(mof_name):
-                source_path = "{}/{}".format(self.oms_results_folder, mof_name)
+            source_path = "{}/{}".format(self.oms_results_folder, mof_name)
+            if self._results_exist(source_path, mof_name):
                 Helper.copy_folder(destination_path, source_path)
+            elif mof_name in self.result_store:
+                stored.append(mof_name)
+        if stored:
+            self.result_store.copy_to(ResultStore(destination_path), stored)
         self.analysis_folder = tf_abspath
         self._validate_properties(['has_oms'])
         print(self.separator)
 
+    def export_results(self, target_folder=None, mof_names=None):
+        """Write the OMS results stored in the npz format in the same layout
+        as the JSON format: a folder for every MOF with a JSON file, the CIF
+        files of the coordination spheres (if their coordinates were stored)
+        and the CIF files of the metal and organic parts of the MOF, which
+        are created from the original CIF file.
+
+        :param target_folder: Folder to write the MOF folders to. If None
+        the OMS results folder is used. (default: None)
+        :param mof_names: Names of the MOFs to export, if None all the MOFs
+        in the collection with results in the npz format are exported.
+        (default: None)
+        """
+        if target_folder is None:
+            target_folder = self.oms_results_folder
+        store = self.result_store
+        if mof_names is None:
+            mof_names = [mi['mof_name'] for mi in self.mof_coll]
+        mof_files = {mi['mof_name']: mi['mof_file'] for mi in self.mof_coll}
+        print(self.separator)
+        print('Exporting results to {}'.format(target_folder))
+        for mof_name in mof_names:
+            if mof_name not in store:
+                continue
+            mof_folder = "{}/{}".format(target_folder, mof_name)
+            Helper.make_folder(mof_folder)
+            summary = store.get_summary(mof_name)
+            if store.has_spheres(mof_name):
+                store.write_cif_files(mof_name, mof_folder)
+            if mof_name in mof_files:
+                mof = self._create_mof_from_cif_file(mof_files[mof_name],
+                                                     summary['checksum'],
+                                                     self.fast_cif_reader)
+                if mof.metal:
+                    mof.metal.to(filename="{}/{}_metal.cif".format(
+                        mof_folder, mof_name))
+                mof.organic.to(filename="{}/{}_organic.cif".format(
+                    mof_folder, mof_name))
+            with open("{}/{}.json".format(mof_folder, mof_name), 'w') as f:
+                json.dump(summary, f, indent=3)
+        print('Done')
+        print(self.separator)
+
     def summarize_results(self, max_atomic_number=None):
         """Create a summary table for the OMS results of the collection, group
         results by metal type.
@@ -529,7 +713,7 @@ class MofCollection:
         fname = "{0}/stats.out".format(self.summary_folder, max_atomic_number)
         if max_atomic_number:
             subset = pd.Series(s_df.index).apply(
-                lambda x: Atom(x).atomic_number <= max_atomic_number)
+                lambda x: Atom.get(x).atomic_number <= max_atomic_number)
             s_df = s_df.loc[subset.values]
             fname = "{0}/stats_less_{1}.out".format(self.summary_folder,
                                                     max_atomic_number)
@@ -553,44 +737,136 @@ class MofCollection:
         for n in range(4, 7):
             self._write_t_factors(sites_u, n, tfac_analysis_folder)
 
+    def timing_report(self, top=10):
+        """Summarize the timings recorded by analyse_mofs with timings set:
+        the total time spent in every stage over the collection and the
+        slowest MOFs with the stage that took them longest and the change
+        in resident memory over all of their stages. Both tables are
+        printed and written to the summary folder.
+
+        :param top: Number of slowest MOFs listed. (default: 10)
+        :return: The per stage totals and the slowest MOFs as DataFrames, or
+        None if no timings were recorded.
+        """
+        times = {}
+        rss_change = {}
+        for mi in self.mof_coll:
+            mp = self.properties[mi['checksum']]
+            if 'timings' not in mp:
+                continue
+            times[mi['mof_name']] = {stage: t['time']
+                                     for stage, t in mp['timings'].items()}
+            rss_change[mi['mof_name']] = sum(
+                [t.get('rss_change_mb') or 0 for t in mp['timings'].values()])
+        if not times:
+            print('No timings recorded, run analyse_mofs with timings=True.')
+            return None
+        df = pd.DataFrame.from_dict(times, orient='index').fillna(0.0)
+
+        stage_totals = pd.DataFrame({'Total (s)': df.sum(),
+                                     'Mean (s)': df.mean(),
+                                     'Max (s)': df.max()})
+        stage_totals['Share (%)'] = (100.0 * stage_totals['Total (s)']
+                                     / stage_totals['Total (s)'].sum())
+        stage_totals.sort_values('Total (s)', inplace=True, ascending=False)
+
+        total = df.sum(axis=1)
+        slowest = pd.DataFrame({'Total (s)': total,
+                                'Slowest stage': df.idxmax(axis=1),
+                                'Slowest stage (s)': df.max(axis=1),
+                                'RSS change (MB)': pd.Series(rss_change)})
+        slowest = slowest.sort_values('Total (s)', ascending=False).head(top)
+
+        print(self.separator)
+        print('Timings of {} MOFs, {:.2f} sec in total'.format(len(df),
+                                                              total.sum()))
+        print(self.separator)
+        with pd.option_context('display.width', 200,
+                               'display.max_columns', None):
+            print('Time per stage\n')
+            print(stage_totals)
+            print('\nSlowest MOFs\n')
+            print(slowest)
+        stage_totals.to_csv('{}/timings_stages.out'.format(self.summary_folder),
+                            sep=' ')
+        slowest.to_csv('{}/timings_slowest.out'.format(self.summary_folder),
+                       sep=' ')
+        return stage_totals, slowest
+
     def _load_mofs(self):
-        """Add MOfs to collection, use CIF file checksum as an identifier."""
+        """Add MOfs to collection, use CIF file checksum as an identifier.
+
+        Checksums are computed in a thread pool and cached in the properties
+        store by path, size and modification time, so that unchanged files
+        are not read again when the collection is loaded a second time.
+        """
         print('Loading CIF files...')
+        properties = self.properties
+        cache = properties.file_checksums()
+        analysed = properties.analysed_checksums()
+        mof_names = properties.mof_names()
+        new_checksums = []
         li = max(int(len(self.path_list) / 1000), 1)
         lm = len(self.path_list) / 100.0
-        for i, mof_file in enumerate(self.path_list):
-            if i % li == 0:
-                print("{:4.1f} %".format((i+1) / lm), end="\r", flush=True)
-            checksum = Helper.get_checksum(mof_file)
-            mof_name = os.path.splitext(os.path.basename(mof_file))[0]
-            mof_info = {"mof_name": mof_name,
-                        "mof_file": mof_file,
-                        "checksum": checksum}
-            self.mof_coll.append(mof_info)
-            if checksum not in self.properties:
-                self.properties[checksum] = {"mof_name": mof_name}
-            else:
-                if self.properties[checksum]["mof_name"] != mof_name:
+        with ThreadPoolExecutor() as executor:
+            results = executor.map(self._file_checksum, self.path_list,
+                                   [cache] * len(self.path_list))
+            for i, (mof_file, (checksum, row)) in enumerate(
+                    zip(self.path_list, results)):
+                if i % li == 0:
+                    print("{:4.1f} %".format((i+1) / lm), end="\r",
+                          flush=True)
+                if row is not None:
+                    new_checksums.append(row)
+                mof_name = os.path.splitext(os.path.basename(mof_file))[0]
+                mof_info = {"mof_name": mof_name,
+                            "mof_file": mof_file,
+                            "checksum": checksum}
+                self.mof_coll.append(mof_info)
+                if checksum not in mof_names:
+                    properties[checksum] = {"mof_name": mof_name}
+                    mof_names[checksum] = mof_name
+                elif mof_names[checksum] != mof_name:
                     exit("MOF name and CIF checksum mismatch for {}.cif "
                          "{}.cif. Either the CIF files has already been "
-                         "processed with a different name, or the CIF file "
-                         "has changed since it was processed."
-                         "".format(mof_name,
-                                   self.properties[checksum]['mof_name']))
-            if self._check_if_results_exist(mof_name):
-                self._compare_checksums(mof_file, mof_name, checksum)
+                         "processed with a different name, or the CIF "
+                         "file has changed since it was processed."
+                         "".format(mof_name, mof_names[checksum]))
+                if checksum in analysed.get(mof_name, ()):
+                    continue
+                if self._check_if_results_exist(mof_name):
+                    self._compare_checksums(mof_file, mof_name, checksum)
         print("\nAll Done.")
+        properties.store_file_checksums(new_checksums)
         self._store_properties()
 
+    @staticmethod
+    def _file_checksum(mof_file, cache):
+        """Get the checksum of a CIF file, reusing the cached value if the
+        size and modification time of the file have not changed.
+
+        :param mof_file: Path to the CIF file.
+        :param cache: Dictionary of cached checksums as returned by
+        PropertyStore.file_checksums.
+        :return: The checksum and, if the file had to be hashed, the
+        (path, size, mtime_ns, checksum) row to be cached, otherwise None.
+        """
+        path = os.path.abspath(mof_file)
+        stat = os.stat(path)
+        cached = cache.get(path)
+        if cached is not None and cached[:2] == (stat.st_size,
+                                                 stat.st_mtime_ns):
+            return cached[2], None
+        checksum = Helper.get_checksum(path)
+        return checksum, (path, stat.st_size, stat.st_mtime_ns, checksum)
+
     def _compare_checksums(self, mof_file, mof_name, checksum):
         """If OMS results exist for one of the CIF names in the collection then
         ensure that the CIF checksum matches the one in the result file.
         """
         mof_folder = "{0}/{1}/".format(self.oms_results_folder,
                                        mof_name)
-        results_file = "{0}/{1}.json".format(mof_folder, mof_name)
-        with open(results_file, 'r') as f:
-            results_dict = json.load(f)
+        results_dict = self._read_results_summary(mof_name)
         if results_dict['checksum'] != checksum:
             print("Results for a MOF named {0} appear to already exist"
                   " in the analysis folder \n\"{1}\".\nHowever the "
@@ -602,26 +878,168 @@ class MofCollection:
                                                           mof_file))
             exit(1)
 
-    def _run_batch(self, b, batch, overwrite, status):
-        """Run OMS analysis for each of the batches."""
-        for i, mi in enumerate(batch):
-            status[b] = i
-            self._analyse(mi, overwrite)
-        status[b] = -1
+    @staticmethod
+    def _analyse_chunk(chunk, oms_results_folder, overwrite,
+                       fast_cif_reader=False, output_format='json',
+                       output_policy='full', use_symmetry=False,
+                       symprec=0.01, site_cache_file=None,
+                       site_cache_strict=False, timings=False):
+        """Run OMS analysis for a chunk of MOFs in a worker process.
+
+        :param site_cache_file: Path to the database of the SiteCache of the
+        worker, if None no cache is used. (default: None)
+        :return: List of (mof_info, summary, record) tuples, the summary is
+        None if the MOF was not analyzed, the record is the ResultStore record
+        to be stored when using the npz output format.
+        """
+        site_cache = None
+        if site_cache_file is not None:
+            site_cache = shared_site_cache(site_cache_file, site_cache_strict)
+        results = []
+        for mi in chunk:
+            try:
+                summary, record = MofCollection._analyse(
+                    mi, oms_results_folder, overwrite, fast_cif_reader,
+                    output_format, output_policy, use_symmetry, symprec,
+                    site_cache, timings)
+            except Exception as e:
+                print('\nAn Exception occurred: {}'.format(e))
+                print('Cannot analyse {}\n'.format(mi['mof_file']))
+                summary, record = None, None
+            results.append((mi, summary, record))
+            if site_cache is not None:
+                for key, cached, computed in site_cache.mismatches:
+                    print('\nSite cache mismatch in {}: {} cached as {}, '
+                          'computed {}\n'.format(mi['mof_name'], key, cached,
+                                                  computed))
+                site_cache.mismatches.clear()
+        if site_cache is not None:
+            site_cache.flush()
+        return results
 
-    def _analyse(self, mi, overwrite):
+    @staticmethod
+    def _analyse(mi, oms_results_folder, overwrite, fast_cif_reader=False,
+                 output_format='json', output_policy='full',
+                 use_symmetry=False, symprec=0.01, site_cache=None,
+                 timings=False):
         """For a given CIF file, create MofStructure object and run OMS
         analysis. If overwrite is false check if results already exist first.
+
+        :return: The summary of the analysis, or of the failed CIF read, None
+        if the analysis was not run. In the npz output format also the
+        ResultStore record of the results, otherwise None.
         """
-        mof_folder = "{}/{}".format(self.oms_results_folder, mi['mof_name'])
-        results_exist = self._check_if_results_exist(mi['mof_name'])
+        mof_folder = "{}/{}".format(oms_results_folder, mi['mof_name'])
+        results_exist = MofCollection._results_exist(mof_folder,
+                                                     mi['mof_name'])
         if not overwrite and results_exist:
             print("Skipping {}. Results already exist and overwrite is set "
                   "to False.".format(mi['mof_name']))
-            return
-        mof = self._create_mof_from_cif_file(mi['mof_file'])
-        if mof.summary['cif_okay']:
-            mof.analyze_metals(output_folder=mof_folder)
+            return None, None
+        mof = MofCollection._create_mof_from_cif_file(mi['mof_file'],
+                                                      mi['checksum'],
+                                                      fast_cif_reader,
+                                                      timings)
+        if not mof.summary['cif_okay']:
+            # Return the summary of the failed read so that it is recorded
+            # without parsing the CIF file again.
+            return mof.summary, None
+        if output_format == 'npz':
+            summary = mof.analyze_metals(output_folder=None,
+                                         use_symmetry=use_symmetry,
+                                         symprec=symprec,
+                                         site_cache=site_cache,
+                                         timings=timings)
+            sphere_coordinates = output_policy != 'summary'
+            return summary, ResultStore.make_record(mof, summary,
+                                                    sphere_coordinates)
+        return mof.analyze_metals(output_folder=mof_folder,
+                                  output_policy=output_policy,
+                                  use_symmetry=use_symmetry,
+                                  symprec=symprec,
+                                  site_cache=site_cache,
+                                  timings=timings), None
+
+    def _update_results_df(self, attr, make_columns, chunk_size=10000):
+        """Add to a results DataFrame the MOFs analysed since it was last
+        updated. The rows of the new MOFs are built column by column and
+        appended in chunks of chunk_size MOFs.
+
+        :param attr: Name of the attribute holding the DataFrame.
+        :param make_columns: Function making the index and the columns of
+        the rows of a list of MOF properties.
+        :return: The DataFrame, or False if no MOF has been analysed.
+        """
+        included = self._df_checksums.setdefault(attr, set())
+        new_mofs = []
+        not_analysed = 0
+        for mi in self.mof_coll:
+            if mi['checksum'] in included:
+                continue
+            mp = self.properties[mi['checksum']]
+            if 'metal_sites' in mp:
+                new_mofs.append(mp)
+                included.add(mi['checksum'])
+            elif not self._validate_property(mp, ['has_oms']):
+                not_analysed += 1
+        if not_analysed:
+            print('OMS analysis not finished for {} of {} MOFs in '
+                  'collection.'.format(not_analysed, len(self.mof_coll)))
+        if not included:
+            return False
+        frames = []
+        if getattr(self, attr) is not None:
+            frames.append(getattr(self, attr))
+        for i in range(0, len(new_mofs), chunk_size):
+            index, columns = make_columns(new_mofs[i:i + chunk_size])
+            frames.append(pd.DataFrame(columns, index=index))
+        if len(frames) > 1:
+            setattr(self, attr, pd.concat(frames))
+        elif frames:
+            setattr(self, attr, frames[0])
+        return getattr(self, attr)
+
+    @staticmethod
+    def _mof_oms_rows(mof_properties):
+        """Index and columns of the mof_oms_df rows of a list of MOFs."""
+        index = []
+        columns = {'Metal Types': [], 'Has OMS': [], 'OMS Types': []}
+        for mp in mof_properties:
+            metal_sites = mp['metal_sites']
+            if len(metal_sites) == 0:
+                print('No Metal Found in {}'.format(mp['name']))
+            oms_types = list(set([ms["metal"] for ms in metal_sites
+                                  if ms["is_open"] and ms["unique"]]))
+            index.append(mp['name'])
+            columns['Metal Types'].append(",".join(set(mp['metal_species'])))
+            columns['Has OMS'].append('Yes' if mp['has_oms'] else 'No')
+            columns['OMS Types'].append(",".join(oms_types) if oms_types
+                                        else "N/A")
+        return index, columns
+
+    @staticmethod
+    def _metal_site_rows(mof_properties):
+        """Index and columns of the metal_site_df rows of a list of MOFs, one
+        row per metal site."""
+        index = []
+        columns = {}
+        mof_names = []
+        for mp in mof_properties:
+            metal_sites = mp['metal_sites']
+            if len(metal_sites) == 0:
+                print('No Metal Found in {}'.format(mp['name']))
+            for i, ms in enumerate(metal_sites):
+                for key, value in ms.items():
+                    if key in ('all_dihedrals', 'min_dihedral'):
+                        continue
+                    columns.setdefault(key, [None] * len(index)).append(value)
+                index.append(mp['name'] + '_' + str(i))
+                mof_names.append(mp['name'])
+                for column in columns.values():
+                    if len(column) < len(index):
+                        column.append(None)
+        columns['mof_name'] = mof_names
+        return index, columns
 
     def _make_batches(self, num_batches=1, overwrite=False):
         """Split collection into number of batches
@@ -668,26 +1086,65 @@ class MofCollection:
         # Sort mof list using the load balancing index
         subset.sort(key=lambda x: lbi[x['mof_name']])
 
-        sum_load_balance = sum(lbi[mi["mof_name"]] for mi in subset)
-        lb_per_batch = sum_load_balance / num_batches
-
         # Select only up to analysis_limit to work with
         if self.analysis_limit and len(subset) > self.analysis_limit:
             subset = subset[0:self.analysis_limit]
 
+        # Longest processing time first: each MOF, largest first, is added to
+        # the batch with the lowest load so far.
         self.batches = [[] for b in range(num_batches)]
-        for i, mi in enumerate(subset):
-            sum_lb = sum([lbi[mi["mof_name"]] for mi in subset[0:i]])
-            batch = int(sum_lb / lb_per_batch)
+        self.batch_loads = [0 for b in range(num_batches)]
+        heap = [(0, b) for b in range(num_batches)]
+        for mi in reversed(subset):
+            load, batch = heapq.heappop(heap)
             self.batches[batch].append(mi)
+            self.batch_loads[batch] = load + lbi[mi["mof_name"]]
+            heapq.heappush(heap, (self.batch_loads[batch], batch))
+        # Keep the MOFs of each batch sorted by increasing load.
+        for batch in self.batches:
+            batch.reverse()
+
+        mean_load = sum(self.batch_loads) / num_batches
         print(self.separator)
         for i, batch in enumerate(self.batches):
-            print("Batch {0} has {1} MOFs".format(i+1, len(batch)))
+            imbalance = self.batch_loads[i] / mean_load if mean_load else 1.0
+            print("Batch {0} has {1} MOFs, predicted load {2} "
+                  "({3:.2f} x mean)".format(i+1, len(batch),
+                                            self.batch_loads[i], imbalance))
         print(self.separator)
 
     def _check_if_results_exist(self, mof_name):
-        """Check if OMS results already exist for a MOF"""
+        """Check if OMS results already exist for a MOF, either in a JSON
+        result file or in the npz result store."""
         mof_folder = "{}/{}".format(self.oms_results_folder, mof_name)
+        if self._results_exist(mof_folder, mof_name):
+            return True
+        return mof_name in self.result_store
+
+    def _read_results_summary(self, mof_name):
+        """Read the summary of the OMS results of a MOF. If results exist both
+        in a JSON result file and in the npz result store, the most recent
+        ones are used.
+
+        :return: The summary dictionary, None if there are no results.
+        """
+        results_file = "{0}/{1}/{1}.json".format(self.oms_results_folder,
+                                                 mof_name)
+        store = self.result_store
+        if mof_name in store:
+            shard_path = store.index[mof_name][0]
+            if not (os.path.isfile(results_file) and
+                    os.path.getmtime(results_file) >
+                    os.path.getmtime(shard_path)):
+                return store.get_summary(mof_name)
+        if os.path.isfile(results_file):
+            with open(results_file, 'r') as f:
+                return json.load(f)
+        return None
+
+    @staticmethod
+    def _results_exist(mof_folder, mof_name):
+        """Check if finished OMS results exist in a MOF result folder"""
         if os.path.isfile(mof_folder+'/'+mof_name+'.json'):
             if not os.path.isfile(mof_folder + '/' + 'analysis_running'):
                 return True
@@ -708,53 +1165,110 @@ class MofCollection:
         print()
 
     def _apply_filter(self, filter_, v, f):
-        """Apply the proper filter_function for the given filter"""
+        """Apply the proper filter_function for the given filter to a column
+        of the property table, returns a boolean Series."""
         return self.filter_functions[filter_](v, f)
 
     @staticmethod
     def _apply_filter_value(v, f):
-        """Filter function to match a value. Returns false if values is None"""
-        if not v:
-            return False
-        return v == f
+        """Filter function to match a value. Missing values, zero and False
+        are never matched."""
+        return v.notna() & (v != 0) & (v == f)
 
     @staticmethod
     def _apply_filter_in_value(v, f):
-        """Filter function to match all values of a list"""
-        if not v:
-            return False
-        return all([f_ in v for f_ in f])
+        """Filter function to match all values of a list, the lists are
+        strings as in the indexed columns of the PropertyStore. Empty lists
+        are never matched."""
+        match = v.notna() & (v != ',,')
+        for f_ in f:
+            match &= v.str.contains(',{},'.format(f_), regex=False)
+        return match.fillna(False)
 
     @staticmethod
     def _apply_value_in_filter(v, f):
         """Filter function to match any of the values of a list"""
-        if not v:
-            return False
-        return v in f
+        return v.notna() & (v != '') & v.isin(list(f))
 
     @staticmethod
     def _apply_filter_range(v, f):
-        """Filter function to match a range of values"""
-        if not v:
-            return False
-        return min(f) <= v <= max(f)
+        """Filter function to match a range of values. Missing values and
+        zero are never matched."""
+        return v.notna() & (v != 0) & (v >= min(f)) & (v <= max(f))
+
+    def _property_table(self):
+        """Get the properties used by the filters as a table with one row per
+        MOF, in the order of mof_coll. The table is read from the indexed
+        columns of the properties store and kept until the properties change.
+        """
+        properties = self.properties
+        if (self._filter_table is None or self._filter_table[0] !=
+                (properties.filename, properties.version)):
+            checksums = [mi['checksum'] for mi in self.mof_coll]
+            table = properties.property_columns().reindex(checksums)
+            table = table.reset_index(drop=True)
+            self._filter_table = ((properties.filename, properties.version),
+                                  table)
+        return self._filter_table[1]
+
+    @staticmethod
+    def _valid_rows(table, keys):
+        """Check in the property table which MOFs have valid values for the
+        given properties, or could not be read. The other MOFs need to be
+        validated with _validate_properties.
+
+        :return: Boolean array with one value per row.
+        """
+        return (table[keys].notna().all(axis=1)
+                | (table['cif_okay'] == 0)).to_numpy()
 
-    def _validate_properties(self, keys):
+    def _sub_collection(self, rows):
+        """Create a collection holding some of the MOFs in the collection. The
+        new collection reuses the checksums, the properties and the property
+        table of the MOFs, so the CIF files are not read again.
+
+        :param rows: Positions of the MOFs in mof_coll.
+        :return: The new MofCollection.
+        """
+        self._store_properties()
+        table = self._property_table()
+        # The entries of mof_coll are never changed in place, so they can
+        # be shared.
+        mof_coll = [self.mof_coll[i] for i in rows]
+        sub_collection = MofCollection([mi['mof_file'] for mi in mof_coll],
+                                       analysis_folder=self.analysis_folder,
+                                       fast_cif_reader=self.fast_cif_reader,
+                                       mof_coll=mof_coll)
+        properties = sub_collection.properties
+        sub_collection._filter_table = (
+            (properties.filename, properties.version),
+            table.iloc[rows].reset_index(drop=True))
+        return sub_collection
+
+    def _validate_properties(self, keys, mof_list=None):
         """Check if a given property can be found in the properties dictionary.
         If not try to read the CIF file and check again. If the check fails
         again try to read the OMS results and check again. If the check fails
-        a third time return False, the property cannot be validated."""
+        a third time return False, the property cannot be validated.
+
+        :param mof_list: MOFs to check, if None all the MOFs in the
+        collection are checked. (default: None)
+        """
+        if mof_list is None:
+            mof_list = self.mof_coll
         msg = {1: "Validating property", 2: "Validating properties"}
         print('\n{} : '.format(msg[min(2, len(keys))]), end='')
         print("\"{}\"".format(", ".join([k for k in keys])))
         validation_level = 0
-        li = max(int(len(self.mof_coll)/1000), 1)
-        lm = len(self.mof_coll) / 100
-        for i, mi in enumerate(self.mof_coll):
+        li = max(int(len(mof_list)/1000), 1)
+        lm = len(mof_list) / 100
+        for i, mi in enumerate(mof_list):
             if i % li == 0:
                 print("{:4.1f} % {} {:100}".format((i+1) / lm, mi['mof_name'],
                                                    " "), end="\r", flush=True)
             mp = self.properties[mi['checksum']]
+            if not self._validate_property(mp, keys):
+                self._update_property_from_cif_header(mi)
             if not self._validate_property(mp, keys):
                 self._update_property_from_cif_file(mi)
                 validation_level = 1
@@ -783,34 +1297,59 @@ class MofCollection:
     def _update_property_from_cif_file(self, mi):
         """Update properties dictionary from a CIF file."""
         mp = self.properties[mi['checksum']]
-        mof = self._create_mof_from_cif_file(mi['mof_file'])
+        mof = self._create_mof_from_cif_file(mi['mof_file'], mi['checksum'],
+                                             self.fast_cif_reader)
         if mof:
             mp.update(mof.summary)
             self.load_balance_index[mi['mof_name']] = len(mof) * len(mof)
             mp['load_balancing_index'] = self.load_balance_index[mi['mof_name']]
 
+    def _update_property_from_cif_header(self, mi):
+        """Update the load balancing index from a scan of the CIF file,
+        without building the structure. The other properties are left to be
+        read from the full structure, since the scan cannot tell whether the
+        CIF file can be read."""
+        mp = self.properties[mi['checksum']]
+        try:
+            num_atoms = count_cif_atoms(mi['mof_file'])
+        except Exception:
+            return
+        self.load_balance_index[mi['mof_name']] = num_atoms * num_atoms
+        mp['load_balancing_index'] = self.load_balance_index[mi['mof_name']]
+
     def _update_property_from_oms_result(self, mi):
-        """Update properties dictionary from an OMS result file."""
+        """Update properties dictionary from the OMS results of a MOF."""
         mp = self.properties[mi['checksum']]
-        mof_name = mp["mof_name"]
-        mof_folder = "{0}/{1}/".format(self.oms_results_folder, mof_name)
-        results_file = "{0}/{1}.json".format(mof_folder, mof_name)
-        results_dict = None
-        if os.path.isfile(results_file):
-            results_dict = json.load(open(results_file))
+        results_dict = self._read_results_summary(mp["mof_name"])
         if isinstance(results_dict, dict):
-            results_dict['source_name'] = mof_folder
-            mp.update(results_dict)
+            self._update_property_from_summary(mi, results_dict)
+
+    def _update_property_from_summary(self, mi, summary):
+        """Update properties dictionary from the summary of an OMS analysis."""
+        mp = self.properties[mi['checksum']]
+        mof_folder = "{0}/{1}/".format(self.oms_results_folder, mi['mof_name'])
+        if any(mi['checksum'] in c for c in self._df_checksums.values()):
+            # The MOF was analysed again, rebuild the results DataFrames.
+            self._df_checksums = {}
+            self._mof_oms_df = None
+            self._metal_site_df = None
+        mp.update(summary)
+        mp['source_name'] = mof_folder
 
     def _store_properties(self):
-        """Store properties dictionary as a python pickle file."""
-        with open(self._properties_filename, 'wb') as properties_file:
-            pickle.dump(self._properties, properties_file)
+        """Write the modified MOF properties to the properties store."""
+        self.properties.flush()
 
     @staticmethod
-    def _create_mof_from_cif_file(path_to_mof):
-        """Create and return a MofStructure object from a path to a CIF file."""
-        mof = MofStructure.from_file(path_to_mof, primitive=False)
+    def _create_mof_from_cif_file(path_to_mof, checksum=None,
+                                  fast_cif_reader=False, timings=False):
+        """Create and return a MofStructure object from a path to a CIF file.
+        If the checksum of the file is already known it is not computed
+        again."""
+        mof = MofStructure.from_file(path_to_mof, primitive=False,
+                                     checksum=checksum,
+                                     fast_reader=fast_cif_reader,
+                                     timings=timings)
         return mof
 
     def _write_t_factors(self, sites, n, target):
@@ -0,0 +1,91 @@
+import numpy as np
+
+
+class NeighborList:
+    """Sparse periodic neighbor list stored in compressed sparse row (CSR)
+    form.
+
+    For every site only the closest periodic image of each neighbor within the
+    cutoff is kept, which reproduces the minimum image convention used by
+    pymatgen's get_all_distances without storing a dense N x N matrix.
+    """
+
+    def __init__(self, num_sites, centers, neighbors, distances, images):
+        """Create a NeighborList from flat arrays of (center, neighbor) pairs.
+
+        :param num_sites: Number of sites in the structure.
+        :param centers: Index of the center site of each pair.
+        :param neighbors: Index of the neighbor site of each pair.
+        :param distances: Distance between the sites of each pair.
+        :param images: Lattice translation of the neighbor for each pair.
+        """
+        centers = np.asarray(centers, dtype=np.int64)
+        neighbors = np.asarray(neighbors, dtype=np.int64)
+        distances = np.asarray(distances, dtype=float)
+        images = np.rint(np.asarray(images).reshape(-1, 3)).astype(np.int64)
+
+        # Drop periodic images of a site with itself and keep only the closest
+        # image of every (center, neighbor) pair.
+        keep = centers != neighbors
+        centers = centers[keep]
+        neighbors = neighbors[keep]
+        distances = distances[keep]
+        images = images[keep]
+        order = np.lexsort((distances, neighbors, centers))
+        centers = centers[order]
+        neighbors = neighbors[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = ((centers[1:] != centers[:-1])
+                     | (neighbors[1:] != neighbors[:-1]))
+
+        self.num_sites = num_sites
+        self.centers = centers[first]
+        self.indices = neighbors[first]
+        self.distances = distances[order][first]
+        self.images = images[order][first]
+        counts = np.bincount(self.centers, minlength=num_sites)
+        self.indptr = np.concatenate(([0], np.cumsum(counts)))
+
+    @classmethod
+    def from_structure(cls, structure, cutoff):
+        """Build the neighbor list of a pymatgen Structure using a cell list
+        search for all pairs closer than cutoff.
+
+        :param structure: pymatgen Structure to search.
+        :param cutoff: Largest distance between two sites to be considered
+        neighbors.
+        :return: NeighborList of the structure.
+        """
+        centers, neighbors, images, distances = structure.get_neighbor_list(
+            cutoff)
+        return cls(len(structure), centers, neighbors, distances, images)
+
+    def __len__(self):
+        return self.num_sites
+
+    @property
+    def num_pairs(self):
+        """Number of (center, neighbor) pairs stored."""
+        return len(self.indices)
+
+    def neighbors(self, center):
+        """Get the neighbors of a site.
+
+        :param center: Index of the site.
+        :return: Neighbor indices (in ascending order), distances and lattice
+        translations of the neighbors.
+        """
+        start, end = self.indptr[center], self.indptr[center + 1]
+        return (self.indices[start:end], self.distances[start:end],
+                self.images[start:end])
+
+    def select(self, mask):
+        """Create a new NeighborList holding only the pairs for which mask is
+        True.
+
+        :param mask: Boolean array with one value per stored pair.
+        :return: The reduced NeighborList.
+        """
+        return NeighborList(self.num_sites, self.centers[mask],
+                            self.indices[mask], self.distances[mask],
+                            self.images[mask])
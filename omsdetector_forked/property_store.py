@@ -0,0 +1,333 @@
+import os
+import json
+import pickle
+import sqlite3
+import numpy as np
+import pandas as pd
+
+
+class MofProperties(dict):
+    """Properties of a single MOF. Any change marks the MOF as modified in the
+    PropertyStore it belongs to, so that only modified MOFs are written."""
+
+    def __init__(self, store, checksum, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._store = store
+        self._checksum = checksum
+
+    def __reduce__(self):
+        # Copies and pickles are plain dictionaries, detached from the store.
+        return dict, (dict(self),)
+
+    def _mark_modified(self):
+        self._store.mark_modified(self._checksum)
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._mark_modified()
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._mark_modified()
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._mark_modified()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self._mark_modified()
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self._mark_modified()
+        return super().pop(*args)
+
+    def popitem(self):
+        self._mark_modified()
+        return super().popitem()
+
+    def clear(self):
+        super().clear()
+        self._mark_modified()
+
+
+class PropertyStore:
+    """SQLite backed store for the properties of the MOFs in a collection,
+    keyed by the checksum of their CIF file.
+
+    The store behaves like a dictionary of MofProperties. Records are read
+    from the database only when they are first accessed and flush writes
+    back only the records that were modified since the last flush. The
+    properties used for filtering are also kept in their own indexed columns.
+    """
+
+    indexed_columns = ['mof_name', 'has_oms', 'metal_species', 'density',
+                       'uc_volume', 'oms_density', 'cif_okay',
+                       'non_metal_species']
+    # Indexed columns added after the first version of the store.
+    added_columns = {'cif_okay': 'INTEGER', 'non_metal_species': 'TEXT'}
+
+    def __init__(self, filename):
+        """Open (or create) a property store.
+
+        :param filename: Path to the SQLite database file.
+        """
+        self.filename = filename
+        self.version = 0
+        self._records = {}
+        self._modified = set()
+        self._conn = sqlite3.connect(filename, timeout=60)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS properties ('
+                'checksum TEXT PRIMARY KEY, mof_name TEXT, has_oms INTEGER, '
+                'metal_species TEXT, density REAL, uc_volume REAL, '
+                'oms_density REAL, data TEXT NOT NULL, cif_okay INTEGER, '
+                'non_metal_species TEXT)')
+            self._add_columns()
+            for column in self.indexed_columns:
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS properties_{0} '
+                    'ON properties ({0})'.format(column))
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta ('
+                               'key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS file_checksums ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, '
+                'checksum TEXT NOT NULL)')
+
+    def __getitem__(self, checksum):
+        if checksum not in self._records:
+            row = self._conn.execute(
+                'SELECT data FROM properties WHERE checksum = ?',
+                (checksum,)).fetchone()
+            if row is None:
+                raise KeyError(checksum)
+            self._records[checksum] = MofProperties(self, checksum,
+                                                    json.loads(row[0]))
+        return self._records[checksum]
+
+    def __setitem__(self, checksum, properties):
+        self._records[checksum] = MofProperties(self, checksum, properties)
+        self.mark_modified(checksum)
+
+    def __contains__(self, checksum):
+        if checksum in self._records:
+            return True
+        row = self._conn.execute(
+            'SELECT 1 FROM properties WHERE checksum = ?',
+            (checksum,)).fetchone()
+        return row is not None
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        """Checksums of all the MOFs in the store."""
+        rows = self._conn.execute('SELECT checksum FROM properties')
+        checksums = [r[0] for r in rows]
+        known = set(checksums)
+        checksums += [c for c in self._records if c not in known]
+        return checksums
+
+    def mark_modified(self, checksum):
+        """Mark the properties of a MOF to be written on the next flush."""
+        self._modified.add(checksum)
+        self.version += 1
+
+    def flush(self):
+        """Write the modified records to the database."""
+        if not self._modified:
+            return
+        rows = [self._make_row(c, self._records[c]) for c in self._modified]
+        with self._conn:
+            self._conn.executemany(self._insert_statement(), rows)
+        self._modified.clear()
+
+    def file_checksums(self):
+        """Get the cached checksums of CIF files.
+
+        :return: Dictionary mapping the path of a file to a (size, mtime_ns,
+        checksum) tuple, the checksum is valid only as long as the size and
+        modification time of the file are unchanged.
+        """
+        rows = self._conn.execute(
+            'SELECT path, size, mtime_ns, checksum FROM file_checksums')
+        return {r[0]: tuple(r[1:]) for r in rows}
+
+    def store_file_checksums(self, rows):
+        """Cache the checksums of CIF files.
+
+        :param rows: Iterable of (path, size, mtime_ns, checksum) tuples.
+        """
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO file_checksums VALUES (?, ?, ?, ?)',
+                rows)
+
+    def mof_names(self):
+        """Get the names of all the MOFs in the store from the indexed
+        column, without loading their records.
+
+        :return: Dictionary mapping checksums to MOF names.
+        """
+        self.flush()
+        return dict(self._conn.execute(
+            'SELECT checksum, mof_name FROM properties'))
+
+    def analysed_checksums(self):
+        """Get the checksums of the MOFs that have OMS results stored.
+
+        :return: Dictionary mapping MOF names to the set of checksums for
+        which results are stored.
+        """
+        self.flush()
+        rows = self._conn.execute('SELECT mof_name, checksum FROM properties '
+                                  'WHERE has_oms IS NOT NULL')
+        analysed = {}
+        for mof_name, checksum in rows:
+            analysed.setdefault(mof_name, set()).add(checksum)
+        return analysed
+
+    def property_columns(self):
+        """Get the indexed columns of all the MOFs in the store, without
+        loading their records. Lists of species are given as in the
+        database, sorted and separated by commas with a comma at both ends.
+
+        :return: A DataFrame indexed by checksum with one column per indexed
+        column, None where the property is missing or not a valid value.
+        """
+        self.flush()
+        rows = self._conn.execute('SELECT checksum, {} FROM properties'.format(
+            ', '.join(self.indexed_columns))).fetchall()
+        table = pd.DataFrame.from_records(
+            rows, columns=['checksum'] + self.indexed_columns,
+            index='checksum')
+        for column in ['has_oms', 'density', 'uc_volume', 'oms_density',
+                       'cif_okay']:
+            table[column] = pd.to_numeric(table[column])
+        # Few different lists of species are found in a collection.
+        for column in ['metal_species', 'non_metal_species']:
+            table[column] = table[column].astype('category')
+        return table
+
+    def copy_to(self, store):
+        """Write all the records of this store to another PropertyStore,
+        replacing any records with the same checksum.
+
+        :param store: PropertyStore to copy the records to.
+        """
+        self.flush()
+        rows = self._conn.execute('SELECT checksum, {}, data FROM properties'
+                                  ''.format(', '.join(self.indexed_columns)))
+        with store._conn:
+            store._conn.executemany(store._insert_statement(), rows)
+        store.store_file_checksums(
+            (path,) + row for path, row in self.file_checksums().items())
+        store._records.clear()
+        store._modified.clear()
+        store.version += 1
+
+    def migrate_pickle(self, pickle_filename):
+        """Import the properties stored in a properties.pickle file created
+        by older versions, this is done only once for each store.
+
+        :param pickle_filename: Path to the pickle file.
+        """
+        if not os.path.isfile(pickle_filename):
+            return
+        row = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'migrated_pickle'").fetchone()
+        if row is not None:
+            return
+        with open(pickle_filename, 'rb') as properties_file:
+            properties = pickle.load(properties_file)
+        rows = [self._make_row(c, p) for c, p in properties.items()]
+        with self._conn:
+            self._conn.executemany(self._insert_statement(), rows)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('migrated_pickle', ?)",
+                (os.path.abspath(pickle_filename),))
+        print('Migrated {} MOF properties from {}'.format(len(rows),
+                                                          pickle_filename))
+
+    def close(self):
+        """Flush any modified records and close the database."""
+        self.flush()
+        self._conn.close()
+
+    def _add_columns(self):
+        """Add the indexed columns missing from a store created by an older
+        version and fill them from the stored properties."""
+        columns = [r[1] for r in
+                   self._conn.execute('PRAGMA table_info(properties)')]
+        missing = [c for c in self.added_columns if c not in columns]
+        if not missing:
+            return
+        for column in missing:
+            self._conn.execute('ALTER TABLE properties ADD COLUMN {} {}'
+                               ''.format(column, self.added_columns[column]))
+        rows = self._conn.execute('SELECT checksum, data FROM properties')
+        self._conn.executemany(self._insert_statement(),
+                               [self._make_row(c, json.loads(d))
+                                for c, d in rows.fetchall()])
+
+    @classmethod
+    def _insert_statement(cls):
+        """SQL statement inserting or replacing a row made by _make_row."""
+        columns = ['checksum'] + cls.indexed_columns + ['data']
+        return 'INSERT OR REPLACE INTO properties ({}) VALUES ({})'.format(
+            ', '.join(columns), ', '.join(['?'] * len(columns)))
+
+    @classmethod
+    def _make_row(cls, checksum, properties):
+        """Create the database row of the properties of a MOF."""
+        return (checksum,
+                properties.get('mof_name'),
+                cls._bool_or_none(properties.get('has_oms')),
+                cls._species_or_none(properties.get('metal_species')),
+                cls._number_or_none(properties.get('density')),
+                cls._number_or_none(properties.get('uc_volume')),
+                cls._number_or_none(properties.get('oms_density')),
+                cls._bool_or_none(properties.get('cif_okay')),
+                cls._species_or_none(properties.get('non_metal_species')),
+                json.dumps(properties, default=cls._json_default))
+
+    @staticmethod
+    def _bool_or_none(value):
+        """Return value as a bool, or None if it is not a boolean."""
+        if isinstance(value, (bool, np.bool_)):
+            return bool(value)
+        return None
+
+    @staticmethod
+    def _species_or_none(value):
+        """Return a list of species as a sorted string separated by commas,
+        with a comma at both ends so that a species can be matched with
+        ',<species>,', or None if it is not a list."""
+        if isinstance(value, (list, tuple, set)):
+            return ',{},'.format(','.join(sorted(value)))
+        return None
+
+    @staticmethod
+    def _number_or_none(value):
+        """Return value as a float, or None if it is not a number."""
+        if isinstance(value, (bool, np.bool_)):
+            return None
+        if isinstance(value, (int, float, np.number)):
+            return float(value)
+        return None
+
+    @staticmethod
+    def _json_default(value):
+        """Convert NumPy values for JSON serialization."""
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        raise TypeError('{} is not JSON serializable'.format(type(value)))
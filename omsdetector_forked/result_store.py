@@ -0,0 +1,262 @@
+import os
+import glob
+import json
+import time
+import numpy as np
+from pymatgen.core import Lattice
+from omsdetector_forked.mof import MetalSite
+
+
+class ResultStore:
+    """OMS results of many MOFs stored in compressed NumPy (npz) shards in a
+    single folder, instead of a folder with a JSON file and CIF files for
+    every MOF.
+
+    Each shard holds the summaries of a set of MOFs, one column for every
+    property of the metal sites and, optionally, the coordination spheres of
+    the metal sites as flat arrays. Results are buffered and written to a new
+    shard every shard_size MOFs. If the results of a MOF are found in more
+    than one shard, the most recent shard is used.
+    """
+
+    shard_pattern = 'oms_results_*.npz'
+    sphere_keys = ['lattices', 'sphere_offsets', 'sphere_species',
+                   'sphere_frac_coords']
+
+    def __init__(self, folder, shard_size=1000):
+        """Create a ResultStore.
+
+        :param folder: Folder holding the shards.
+        :param shard_size: Number of MOFs written to each shard.
+        (default: 1000)
+        """
+        self.folder = folder
+        self.shard_size = shard_size
+        self._buffer = []
+        self._index = None
+        self._shards = {}
+
+    def __contains__(self, mof_name):
+        return mof_name in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def index(self):
+        """Dictionary mapping the name of every MOF in the store to the shard
+        holding its results and its row in the shard."""
+        if self._index is None:
+            self._index = {}
+            for path in self._shard_paths():
+                with np.load(path) as shard:
+                    for row, mof_name in enumerate(shard['mof_names']):
+                        self._index[str(mof_name)] = (path, row)
+        return self._index
+
+    @staticmethod
+    def make_record(mof, summary, sphere_coordinates=True):
+        """Create the record of the results of a MOF to be added to a store.
+
+        :param mof: The analysed MofStructure.
+        :param summary: Summary of the analysis as returned by analyze_metals.
+        :param sphere_coordinates: Whether to keep the coordinates of the
+        coordination spheres. (default: True)
+        :return: Dictionary holding the record.
+        """
+        record = {'summary': summary,
+                  'lattice': mof.lattice.matrix,
+                  'spheres': None}
+        if sphere_coordinates:
+            record['spheres'] = [(mcs.species, mcs.frac_coords)
+                                 for mcs in mof.result_coord_spheres]
+        return record
+
+    def append(self, record):
+        """Add the record of a MOF to the store, a new shard is written once
+        shard_size records have been added.
+
+        :param record: Record created by make_record.
+        """
+        self._buffer.append(record)
+        if len(self._buffer) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records to a new shard."""
+        if not self._buffer:
+            return
+        os.makedirs(self.folder, exist_ok=True)
+        arrays = self._make_arrays(self._buffer)
+        name = 'oms_results_{:020d}_{}.npz'.format(time.time_ns(),
+                                                   os.getpid())
+        path = os.path.join(self.folder, name)
+        with open(path + '.tmp', 'wb') as shard_file:
+            np.savez_compressed(shard_file, **arrays)
+        os.replace(path + '.tmp', path)
+        if self._index is not None:
+            for row, record in enumerate(self._buffer):
+                self._index[record['summary']['name']] = (path, row)
+        self._buffer = []
+
+    def get_summary(self, mof_name):
+        """Get the summary of the results of a MOF.
+
+        :param mof_name: Name of the MOF.
+        :return: The summary dictionary, as it would be stored in the JSON
+        result file.
+        """
+        path, row = self.index[mof_name]
+        shard = self._load_shard(path)
+        summary = json.loads(str(shard['summaries'][row]))
+        start, end = shard['mof_site_offsets'][row:row + 2]
+        summary['metal_sites'] = [self._site(shard, i)
+                                  for i in range(start, end)]
+        return summary
+
+    def has_spheres(self, mof_name):
+        """Check if the coordination spheres of a MOF are stored."""
+        path, row = self.index[mof_name]
+        with np.load(path) as shard:
+            return 'lattices' in shard.files
+
+    def get_coordination_spheres(self, mof_name):
+        """Get the coordination spheres of the metal sites of a MOF.
+
+        :param mof_name: Name of the MOF.
+        :return: List of MetalSite objects, one for every metal site, in the
+        order of the metal sites in the summary.
+        """
+        path, row = self.index[mof_name]
+        with np.load(path) as shard:
+            if 'lattices' not in shard.files:
+                raise KeyError('Coordination spheres of {} were not '
+                               'stored.'.format(mof_name))
+            lattice = Lattice(shard['lattices'][row])
+            start, end = shard['mof_site_offsets'][row:row + 2]
+            offsets = shard['sphere_offsets']
+            species = shard['sphere_species']
+            frac_coords = shard['sphere_frac_coords']
+            spheres = []
+            for i in range(start, end):
+                a, b = offsets[i], offsets[i + 1]
+                spheres.append(MetalSite(lattice, species[a:b].tolist(),
+                                         frac_coords[a:b]))
+        return spheres
+
+    def write_cif_files(self, mof_name, output_folder):
+        """Write the coordination spheres of a MOF to CIF files named as in
+        the JSON result format.
+
+        :param mof_name: Name of the MOF.
+        :param output_folder: Folder to write the CIF files to.
+        """
+        for index, mcs in enumerate(self.get_coordination_spheres(mof_name)):
+            mcs.write_cif_file(output_folder, index)
+
+    def copy_to(self, store, mof_names):
+        """Copy the results of some of the MOFs to another store.
+
+        :param store: ResultStore to copy the results to.
+        :param mof_names: Names of the MOFs to copy.
+        """
+        for mof_name in mof_names:
+            summary = self.get_summary(mof_name)
+            path, row = self.index[mof_name]
+            with np.load(path) as shard:
+                lattice = (shard['lattices'][row]
+                           if 'lattices' in shard.files else None)
+            spheres = None
+            if lattice is not None:
+                spheres = [(mcs.species, mcs.frac_coords) for mcs in
+                           self.get_coordination_spheres(mof_name)]
+            store.append({'summary': summary, 'lattice': lattice,
+                          'spheres': spheres})
+        store.flush()
+
+    def _shard_paths(self):
+        """Paths of all shards, oldest first."""
+        return sorted(glob.glob(os.path.join(self.folder, self.shard_pattern)))
+
+    def _load_shard(self, path):
+        """Load and cache the summaries and metal site columns of a shard.
+        The coordination spheres are only read when requested."""
+        if path not in self._shards:
+            with np.load(path) as shard:
+                self._shards[path] = {k: shard[k] for k in shard.files
+                                      if k not in self.sphere_keys}
+        return self._shards[path]
+
+    @staticmethod
+    def _site(shard, i):
+        """Get the summary dictionary of the metal site in row i."""
+        site = {}
+        for key in shard['site_keys']:
+            key = str(key)
+            if 'json_column_' + key in shard:
+                site[key] = json.loads(str(shard['json_column_' + key][i]))
+            else:
+                site[key] = shard['column_' + key][i].item()
+                if 'int_rows_' + key in shard and shard['int_rows_' + key][i]:
+                    site[key] = int(site[key])
+        return site
+
+    @staticmethod
+    def _kind(value):
+        """Kind of a site property value, values of different kinds cannot
+        share a NumPy column without changing type."""
+        if isinstance(value, (bool, np.bool_)):
+            return 'bool'
+        if isinstance(value, (int, np.integer)):
+            return 'int'
+        if isinstance(value, (float, np.floating)):
+            return 'float'
+        return type(value).__name__
+
+    @staticmethod
+    def _make_arrays(records):
+        """Convert a list of records to the arrays of a shard."""
+        summaries = []
+        sites = []
+        site_offsets = [0]
+        for record in records:
+            summary = dict(record['summary'])
+            sites.extend(summary.pop('metal_sites'))
+            site_offsets.append(len(sites))
+            summaries.append(json.dumps(summary))
+        site_keys = list(dict.fromkeys(k for site in sites for k in site))
+
+        arrays = {'mof_names': np.array([r['summary']['name']
+                                         for r in records]),
+                  'summaries': np.array(summaries),
+                  'mof_site_offsets': np.array(site_offsets, dtype=np.int64),
+                  'site_keys': np.array(site_keys, dtype=str)}
+        for key in site_keys:
+            values = [site.get(key) for site in sites]
+            kinds = set(ResultStore._kind(v) for v in values)
+            column = np.array(values)
+            if column.dtype == object or (len(kinds) > 1 and
+                                          kinds != {'int', 'float'}):
+                arrays['json_column_' + key] = np.array(
+                    [json.dumps(v) for v in values])
+            else:
+                arrays['column_' + key] = column
+                # Integers stored in a float column, such as the -1
+                # t_factor of sites without one, are cast back when read.
+                if kinds == {'int', 'float'}:
+                    arrays['int_rows_' + key] = np.array(
+                        [ResultStore._kind(v) == 'int' for v in values])
+
+        if all(r['spheres'] is not None for r in records):
+            spheres = [s for r in records for s in r['spheres']]
+            sizes = [len(species) for species, coords in spheres]
+            arrays['lattices'] = np.array([r['lattice'] for r in records])
+            arrays['sphere_offsets'] = np.concatenate(
+                ([0], np.cumsum(sizes))).astype(np.int64)
+            arrays['sphere_species'] = np.array(
+                [sp for species, coords in spheres for sp in species],
+                dtype=str)
+            arrays['sphere_frac_coords'] = np.concatenate(
+                [coords for species, coords in spheres] +
+                [np.empty((0, 3))])
+        return arrays
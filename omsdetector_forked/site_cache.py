@@ -0,0 +1,194 @@
+import math
+import sqlite3
+import hashlib
+import functools
+from collections import OrderedDict
+import numpy as np
+
+
+class SiteCache:
+    """Cache of the open metal site classification of coordination spheres,
+    keyed by a fingerprint of their local environment.
+
+    The same coordination spheres, e.g. copper paddlewheels or Zn4O
+    clusters, are found in many MOFs. The fingerprint of a MetalSite is made
+    of its species and the distances between all its atoms, metal included,
+    rounded to resolution, with the ligands put in a canonical order. It does
+    not change with rotations, translations or the order of the ligands, so
+    the result of MetalSite.check_if_open for a sphere can be reused for all
+    spheres with the same fingerprint.
+
+    The most recently used entries are kept in memory, up to max_size. If a
+    filename is given the entries are also stored in an SQLite database,
+    which can be shared by several processes and reused in later runs.
+
+    In strict mode every cache hit is checked by running check_if_open, the
+    computed result is kept and any difference with the cached result, apart
+    from t-factors within t_factor_tol of each other, is recorded in
+    mismatches.
+    """
+
+    def __init__(self, filename=None, max_size=100000, resolution=0.01,
+                 strict=False, t_factor_tol=1e-3, flush_size=1000):
+        """Create a SiteCache.
+
+        :param filename: Path to the SQLite database, if None the cache is
+        kept in memory only. (default: None)
+        :param max_size: Maximum number of entries kept in memory.
+        (default: 100000)
+        :param resolution: Distances are rounded to this resolution, in
+        Angstrom, in the fingerprint. (default: 0.01)
+        :param strict: Verify every cache hit. (default: False)
+        :param t_factor_tol: Largest difference between the cached and the
+        computed t-factor accepted in strict mode. (default: 1e-3)
+        :param flush_size: Number of new entries written to the database at
+        a time. (default: 1000)
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self.resolution = resolution
+        self.strict = strict
+        self.t_factor_tol = t_factor_tol
+        self.flush_size = flush_size
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = []
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._conn = None
+        if filename is not None:
+            self._conn = sqlite3.connect(filename, timeout=60)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            with self._conn:
+                # t_factor has no declared type so that the integer -1
+                # given to sites without a t-factor is kept as is.
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS sites ('
+                    'fingerprint TEXT PRIMARY KEY, is_open INTEGER, '
+                    'metal_type TEXT, t_factor, is_problematic INTEGER)')
+
+    def __len__(self):
+        return len(self._memory)
+
+    def fingerprint(self, site):
+        """Compute the fingerprint of the local environment of a MetalSite.
+
+        :param site: The MetalSite.
+        :return: Hexadecimal digest of the fingerprint.
+        """
+        coords = site.cart_coords
+        dists = np.linalg.norm(coords[:, np.newaxis] - coords[np.newaxis],
+                               axis=2)
+        q = np.rint(dists / self.resolution).astype(np.int64)
+        ligands = sorted(range(1, site.num_sites),
+                         key=lambda i: (site.species[i], q[0, i],
+                                        tuple(np.sort(q[i]))))
+        order = [0] + ligands
+        q = q[np.ix_(order, order)]
+        key = '{}|{}|{}|{}'.format(
+            self.resolution, site.tolerance['on_plane'],
+            ','.join(site.species[i] for i in order),
+            ','.join(str(d) for d in q[np.triu_indices(len(order), 1)]))
+        return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+    def check_if_open(self, site):
+        """Classify a MetalSite as MetalSite.check_if_open does, reusing the
+        cached result for its fingerprint if there is one.
+
+        :param site: The MetalSite to classify.
+        """
+        key = self.fingerprint(site)
+        cached = self.get(key)
+        if cached is not None and not self.strict:
+            self.hits += 1
+            site.classification = cached
+            return
+        site.check_if_open()
+        result = site.classification
+        if cached is None:
+            self.misses += 1
+            self.put(key, result)
+        else:
+            self.hits += 1
+            if not self._same_classification(cached, result):
+                self.mismatches.append((key, cached, result))
+
+    def get(self, key):
+        """Get the classification stored for a fingerprint.
+
+        :param key: The fingerprint.
+        :return: Tuple of is_open, metal_type, t_factor and is_problematic,
+        or None if the fingerprint is not in the cache.
+        """
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+        value = self._pending.get(key)
+        if value is None and self._conn is not None:
+            row = self._conn.execute(
+                'SELECT is_open, metal_type, t_factor, is_problematic '
+                'FROM sites WHERE fingerprint = ?', (key,)).fetchone()
+            if row is not None:
+                value = (bool(row[0]), row[1], row[2], bool(row[3]))
+        if value is not None:
+            self._remember(key, value)
+        return value
+
+    def put(self, key, value):
+        """Store the classification of a fingerprint.
+
+        :param key: The fingerprint.
+        :param value: Tuple of is_open, metal_type, t_factor and
+        is_problematic.
+        """
+        self._remember(key, value)
+        if self._conn is not None:
+            self._pending[key] = value
+            if len(self._pending) >= self.flush_size:
+                self.flush()
+
+    def flush(self):
+        """Write the new entries to the database."""
+        if not self._pending:
+            return
+        rows = [(k,) + v for k, v in self._pending.items()]
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO sites (fingerprint, is_open, '
+                'metal_type, t_factor, is_problematic) '
+                'VALUES (?, ?, ?, ?, ?)', rows)
+        self._pending = {}
+
+    def close(self):
+        """Write the new entries and close the database."""
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def _same_classification(self, a, b):
+        """Compare two classifications, t-factors are compared within
+        t_factor_tol."""
+        return (a[0] == b[0] and a[1] == b[1] and a[3] == b[3]
+                and math.isclose(a[2], b[2], rel_tol=0,
+                                 abs_tol=self.t_factor_tol))
+
+    def _remember(self, key, value):
+        """Add an entry to the in memory cache, dropping the least recently
+        used entries above max_size."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_site_cache(filename, strict=False):
+    """Get the SiteCache of the current process for a database file, so that
+    a worker process keeps its in memory cache across the MOFs it analyzes.
+
+    :param filename: Path to the SQLite database.
+    :param strict: Verify every cache hit. (default: False)
+    :return: The SiteCache.
+    """
+    return SiteCache(filename, strict=strict)
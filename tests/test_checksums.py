@@ -0,0 +1,70 @@
+import os
+import io
+import shutil
+import contextlib
+from omsdetector_forked.mof import Helper
+from omsdetector_forked.mof_collection import MofCollection
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+
+
+def test_file_checksum_cache(tmp_path):
+    """A cached checksum is used only while the size and modification time
+    of the file are unchanged."""
+    path = str(tmp_path / 'a.cif')
+    with open(path, 'w') as cif_file:
+        cif_file.write('data_a\n')
+    os.utime(path, ns=(10 ** 18, 10 ** 18))
+
+    checksum, row = MofCollection._file_checksum(path, {})
+    assert checksum == Helper.get_checksum(path)
+    assert row == (path, 7, 10 ** 18, checksum)
+
+    cache = {path: (7, 10 ** 18, 'cached')}
+    assert MofCollection._file_checksum(path, cache) == ('cached', None)
+
+    # Same size, new modification time.
+    with open(path, 'w') as cif_file:
+        cif_file.write('data_b\n')
+    os.utime(path, ns=(10 ** 18, 10 ** 18 + 1))
+    checksum, row = MofCollection._file_checksum(path, cache)
+    assert checksum == Helper.get_checksum(path) != 'cached'
+    assert row == (path, 7, 10 ** 18 + 1, checksum)
+
+    # New size, same modification time.
+    with open(path, 'w') as cif_file:
+        cif_file.write('data_ab\n')
+    os.utime(path, ns=(10 ** 18, 10 ** 18))
+    checksum, row = MofCollection._file_checksum(path, cache)
+    assert checksum == Helper.get_checksum(path) != 'cached'
+    assert row == (path, 8, 10 ** 18, checksum)
+
+
+def test_edited_cif_is_hashed_again(tmp_path):
+    """Loading a collection again after a CIF file was edited gives the
+    checksum of the new contents and updates the cache."""
+    cif_folder = tmp_path / 'cifs'
+    cif_folder.mkdir()
+    name = 'ZIF-8_ASR_FAWCEN_SL'
+    path = str(cif_folder / (name + '.cif'))
+    shutil.copy(os.path.join(EXAMPLES, name + '.cif'), path)
+    analysis_folder = str(tmp_path / 'analysis')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mof_coll = MofCollection.from_folder(str(cif_folder),
+                                             analysis_folder=analysis_folder)
+    old_checksum = mof_coll.mof_coll[0]['checksum']
+    assert old_checksum == Helper.get_checksum(path)
+    mof_coll.properties.close()
+
+    with open(path, 'a') as cif_file:
+        cif_file.write('# edited\n')
+    with contextlib.redirect_stdout(io.StringIO()):
+        mof_coll = MofCollection.from_folder(str(cif_folder),
+                                             analysis_folder=analysis_folder)
+    new_checksum = mof_coll.mof_coll[0]['checksum']
+    assert new_checksum == Helper.get_checksum(path) != old_checksum
+    cached = mof_coll.properties.file_checksums()[os.path.abspath(path)]
+    assert cached == (os.path.getsize(path), os.stat(path).st_mtime_ns,
+                      new_checksum)
@@ -0,0 +1,82 @@
+import os
+import glob
+import warnings
+import numpy as np
+import pytest
+from pymatgen.core import Structure
+from pymatgen.io.cif import CifWriter
+from omsdetector_forked import mof
+from omsdetector_forked.cif_reader import read_p1_cif
+from omsdetector_forked.mof import MofStructure
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+CIF_FILES = sorted(glob.glob(os.path.join(EXAMPLES, '*.cif')))
+
+
+@pytest.fixture
+def pymatgen_reads(monkeypatch):
+    """Record the files read with the pymatgen CIF parser."""
+    reads = []
+    from_file = Structure.from_file
+
+    def recording_from_file(filename, *args, **kwargs):
+        reads.append(filename)
+        return from_file(filename, *args, **kwargs)
+
+    monkeypatch.setattr(mof.Structure, 'from_file', recording_from_file)
+    return reads
+
+
+@pytest.mark.parametrize('cif_file', CIF_FILES,
+                         ids=[os.path.basename(p) for p in CIF_FILES])
+def test_read_p1_cif_matches_pymatgen(cif_file):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        expected = Structure.from_file(cif_file)
+    cif_data = read_p1_cif(cif_file)
+    assert cif_data is not None
+    lattice, species, frac_coords = cif_data
+    assert species == [str(sp) for sp in expected.species]
+    np.testing.assert_allclose(lattice.matrix, expected.lattice.matrix,
+                               rtol=0, atol=1e-12)
+    np.testing.assert_allclose(frac_coords, expected.frac_coords,
+                               rtol=0, atol=1e-12)
+
+
+def test_symmetry_expansion_falls_back(tmp_path, pymatgen_reads):
+    """A CIF file listing only the asymmetric unit is read with pymatgen."""
+    path = str(tmp_path / 'HKUST-1_Fm-3m.cif')
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        structure = Structure.from_file(
+            os.path.join(EXAMPLES, 'HKUST-1_ASR_FIQCEN_clean.cif'))
+        CifWriter(structure, symprec=0.01).write_file(path)
+        expected = Structure.from_file(path)
+        assert read_p1_cif(path) is None
+        del pymatgen_reads[:]
+        mof_structure = MofStructure.from_file(path, fast_reader=True)
+    assert pymatgen_reads == [path]
+    assert mof_structure.summary['cif_okay'] is True
+    assert mof_structure.species_str == [str(s) for s in expected.species]
+    np.testing.assert_array_equal(mof_structure.frac_coords,
+                                  expected.frac_coords)
+
+
+def test_partial_occupancy_falls_back(tmp_path, pymatgen_reads):
+    """A CIF file with a partially occupied site is left to pymatgen, and
+    gives the same result as without the fast reader."""
+    with open(os.path.join(EXAMPLES, 'ZIF-8_ASR_FAWCEN_SL.cif')) as cif_file:
+        contents = cif_file.read()
+    path = str(tmp_path / 'ZIF-8_partial.cif')
+    with open(path, 'w') as cif_file:
+        cif_file.write(contents.replace('Uiso   1.00\n', 'Uiso   0.50\n', 1))
+    assert read_p1_cif(path) is None
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        fast = MofStructure.from_file(path, fast_reader=True)
+        assert pymatgen_reads == [path]
+        slow = MofStructure.from_file(path)
+    assert fast.summary['cif_okay'] == slow.summary['cif_okay']
+    assert fast.species_str == slow.species_str
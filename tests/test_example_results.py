@@ -0,0 +1,57 @@
+import os
+import glob
+import json
+import math
+import warnings
+import pytest
+from omsdetector_forked.mof import MofStructure
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+REFERENCE = os.path.join(os.path.dirname(__file__), 'data',
+                         'example_summaries.json')
+CIF_FILES = sorted(glob.glob(os.path.join(EXAMPLES, '*.cif')))
+
+
+@pytest.fixture(scope='module')
+def reference():
+    with open(REFERENCE) as reference_file:
+        return json.load(reference_file)
+
+
+def test_reference_covers_examples(reference):
+    names = [os.path.splitext(os.path.basename(p))[0] for p in CIF_FILES]
+    assert sorted(reference) == names
+
+
+@pytest.mark.parametrize('use_symmetry', [False, True],
+                         ids=['all_sites', 'use_symmetry'])
+@pytest.mark.parametrize('cif_file', CIF_FILES,
+                         ids=[os.path.basename(p) for p in CIF_FILES])
+def test_example_summary(cif_file, use_symmetry, reference, tmp_path):
+    """The OMS results of the example CIF files match the reference output
+    of the original implementation, also when only one metal site of every
+    set of symmetry equivalent sites is analyzed."""
+    name = os.path.splitext(os.path.basename(cif_file))[0]
+    expected = reference[name]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        mof = MofStructure.from_file(cif_file)
+        mof.analyze_metals(str(tmp_path / name), verbose='none',
+                           use_symmetry=use_symmetry)
+    summary = mof.summary
+    # Equivalent sites get the t-factor of the analyzed site, which can
+    # differ from their own by floating point noise.
+    t_factor_tol = 1e-4 if use_symmetry else 1e-6
+
+    assert summary['has_oms'] == expected['has_oms']
+    assert math.isclose(summary['oms_density'], expected['oms_density'],
+                        rel_tol=1e-9)
+    assert len(summary['metal_sites']) == len(expected['metal_sites'])
+    for site, expected_site in zip(summary['metal_sites'],
+                                   expected['metal_sites']):
+        for key in ['metal', 'type', 'is_open', 'unique']:
+            assert site[key] == expected_site[key]
+        assert type(site['t_factor']) is type(expected_site['t_factor'])
+        assert math.isclose(site['t_factor'], expected_site['t_factor'],
+                            abs_tol=t_factor_tol)
@@ -0,0 +1,98 @@
+import os
+import warnings
+import dataclasses
+import pytest
+from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
+from omsdetector_forked.mof import MofStructure, SymmetryUndeterminedError
+from omsdetector_forked.result_store import ResultStore
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+
+
+def read_example(name):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return MofStructure.from_file(os.path.join(EXAMPLES, name))
+
+
+@pytest.mark.parametrize('name', ['HKUST-1_ASR_FIQCEN_clean.cif',
+                                  'MOF-5_ASR_MIBQAR_clean.cif'])
+def test_coordination_sequences_shared_by_equivalent_sites(name,
+                                                           monkeypatch):
+    """Symmetry equivalent metals get the sequence of a single traversal,
+    equal to the one computed for every metal separately."""
+    mof = read_example(name)
+    representatives = mof._find_equivalent_metals()
+    assert len(set(representatives)) < len(representatives)
+    expected = mof._find_coordination_sequences(mof.metal_indices)
+
+    traversed = []
+    bfs = MofStructure._coordination_sequence_bfs
+
+    def counting_bfs(self, centers, *args):
+        traversed.extend(centers.tolist())
+        return bfs(self, centers, *args)
+
+    monkeypatch.setattr(MofStructure, '_coordination_sequence_bfs',
+                        counting_bfs)
+    cs = mof._find_coordination_sequences(mof.metal_indices,
+                                          equivalent=representatives)
+    assert cs == expected
+    assert len(traversed) == len(set(representatives))
+
+
+def test_equivalent_metals_from_dict_dataset(monkeypatch):
+    """spglib versions before 2.5 return the symmetry dataset as a
+    dictionary, which gives the same orbits."""
+    mof = read_example('HKUST-1_ASR_FIQCEN_clean.cif')
+    expected = mof._find_equivalent_metals()
+    assert len(set(expected)) < len(expected)
+    get_dataset = SpacegroupAnalyzer.get_symmetry_dataset
+
+    def dict_dataset(self):
+        return dataclasses.asdict(get_dataset(self))
+
+    monkeypatch.setattr(SpacegroupAnalyzer, 'get_symmetry_dataset',
+                        dict_dataset)
+    assert mof._find_equivalent_metals() == expected
+
+
+def test_equivalent_metals_without_symmetry(monkeypatch):
+    """If the symmetry cannot be found every metal is analyzed, with a
+    warning."""
+    mof = read_example('HKUST-1_ASR_FIQCEN_clean.cif')
+
+    def no_dataset(self):
+        raise SymmetryUndeterminedError('Unable to determine symmetry')
+
+    monkeypatch.setattr(SpacegroupAnalyzer, 'get_symmetry_dataset',
+                        no_dataset)
+    with pytest.warns(UserWarning, match='Cannot find the symmetry'):
+        representatives = mof._find_equivalent_metals()
+    assert representatives == list(range(len(mof.metal_indices)))
+
+
+def test_symmetry_record_builds_analyzed_spheres(monkeypatch):
+    """With use_symmetry the npz record holds a sphere for every metal, but
+    only the spheres of the analyzed metals are built."""
+    mof = read_example('HKUST-1_ASR_FIQCEN_clean.cif')
+    built = []
+    find_sphere = MofStructure._find_metal_coord_sphere
+
+    def counting_find_sphere(self, center):
+        built.append(center)
+        return find_sphere(self, center)
+
+    monkeypatch.setattr(MofStructure, '_find_metal_coord_sphere',
+                        counting_find_sphere)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        summary = mof.analyze_metals(None, use_symmetry=True)
+    record = ResultStore.make_record(mof, summary)
+    representatives = mof._find_equivalent_metals()
+    assert len(record['spheres']) == len(mof.metal_indices)
+    assert sorted(built) == sorted(mof.metal_indices[m]
+                                   for m in set(representatives))
+    for m, r in enumerate(representatives):
+        assert record['spheres'][m][0] == record['spheres'][r][0]
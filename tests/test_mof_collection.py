@@ -0,0 +1,149 @@
+import os
+import io
+import glob
+import contextlib
+import warnings
+import pytest
+from omsdetector_forked.mof_collection import MofCollection
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+CIF_NAMES = sorted(os.path.splitext(os.path.basename(p))[0]
+                   for p in glob.glob(os.path.join(EXAMPLES, '*.cif')))
+
+
+def load_collection(analysis_folder, name_list):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return MofCollection.from_folder(
+            EXAMPLES, analysis_folder=analysis_folder,
+            name_list=[name + '.cif' for name in name_list])
+
+
+def recorded_names(mof_coll):
+    """Names of the MOFs with OMS results in the property store."""
+    return set(mof_coll.properties.analysed_checksums())
+
+
+@pytest.mark.parametrize('output_format', ['json', 'npz'])
+def test_iter_results_early_stop(tmp_path, output_format):
+    """Stopping iter_results after the first result still records the rest
+    of its chunk and the chunks that were running, in the property store
+    and in the result files, and a new run analyses only the others."""
+    analysis_folder = str(tmp_path / 'analysis')
+    name_list = CIF_NAMES[:12]
+    chunk_size = 3
+    mof_coll = load_collection(analysis_folder, name_list)
+    with contextlib.redirect_stdout(io.StringIO()), \
+            warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for summary in mof_coll.iter_results(num_batches=2,
+                                             chunk_size=chunk_size,
+                                             output_format=output_format):
+            break
+    recorded = recorded_names(mof_coll)
+    assert summary['name'] in recorded
+    assert len(recorded) >= chunk_size
+
+    if output_format == 'json':
+        with_files = {name for name in name_list
+                      if MofCollection._results_exist(
+                          os.path.join(mof_coll.oms_results_folder, name),
+                          name)}
+    else:
+        with_files = set(mof_coll.result_store.index)
+    assert with_files == recorded
+
+    mof_coll = load_collection(analysis_folder, name_list)
+    assert recorded_names(mof_coll) == recorded
+    with contextlib.redirect_stdout(io.StringIO()):
+        rest = [s['name'] for s in mof_coll.iter_results(
+            output_format=output_format)]
+    assert sorted(rest) == sorted(set(name_list) - recorded)
+    assert recorded_names(mof_coll) == set(name_list)
+
+
+RANGE_FILTERS = ['density', 'oms_density', 'uc_volume']
+IN_VALUE_FILTERS = ['metal_species', 'non_metal_species']
+
+
+def row_match(key, v, f):
+    """The per MOF filter functions used before the filters were applied to
+    the property table at once."""
+    if not v:
+        return False
+    if key in RANGE_FILTERS:
+        return min(f) <= v <= max(f)
+    if key in IN_VALUE_FILTERS:
+        return all([f_ in v for f_ in f])
+    if key == 'mof_name':
+        return v in f
+    return v == f
+
+
+@pytest.fixture(scope='module')
+def analysed_collection(tmp_path_factory):
+    analysis_folder = str(tmp_path_factory.mktemp('analysis'))
+    mof_coll = load_collection(analysis_folder, CIF_NAMES)
+    with contextlib.redirect_stdout(io.StringIO()), \
+            warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        mof_coll.analyse_mofs()
+    return mof_coll
+
+
+def stored_rows(mof_coll):
+    """All the rows of the property and checksum tables of the database."""
+    conn = mof_coll.properties._conn
+    return (conn.execute('SELECT * FROM properties '
+                         'ORDER BY checksum').fetchall(),
+            conn.execute('SELECT * FROM file_checksums '
+                         'ORDER BY path').fetchall())
+
+
+@pytest.mark.parametrize('filters', [
+    [{'metal_species': ['Cu']}, {'has_oms': True}],
+    # False values are never matched.
+    [{'has_oms': False}, {'metal_species': ['Zn']}],
+    [{'density': [0.5, 1.5]}, {'non_metal_species': ['N']},
+     {'oms_density': [0.0005, 0.01]}],
+    [{'uc_volume': [1000, 5000], 'cif_okay': True},
+     {'mof_name': ['ZIF-8_ASR_FAWCEN_SL', 'MOF-5_ASR_MIBQAR_clean',
+                   'ADEGIA01_clean']}],
+    [{'non_metal_species': ['C', 'H', 'O']}, {'density': [1.0, 3.0]},
+     {'has_oms': True}],
+    [{'metal_species': ['Zn']}, {'uc_volume': [0, 3000]}],
+])
+def test_chained_filters(analysed_collection, filters, monkeypatch):
+    """Chained filter_collection calls match the same MOFs as the previous
+    per MOF filters, and the sub-collections share the entries of mof_coll
+    without writing to the store or reading the CIF files again."""
+    parent = analysed_collection
+    properties = parent.properties
+    expected = [mi['mof_name'] for mi in parent.mof_coll
+                if all(row_match(k, properties[mi['checksum']][k], f)
+                       for using_filter in filters
+                       for k, f in using_filter.items())]
+    before = stored_rows(parent)
+    version = properties.version
+
+    def no_reads(*args, **kwargs):
+        raise AssertionError('A CIF file was read')
+
+    monkeypatch.setattr(MofCollection, '_file_checksum', no_reads)
+    monkeypatch.setattr(MofCollection, '_create_mof_from_cif_file', no_reads)
+    mof_coll = parent
+    with contextlib.redirect_stdout(io.StringIO()):
+        for using_filter in filters:
+            if mof_coll is None:
+                break
+            sub_collection = mof_coll.filter_collection(using_filter)
+            if sub_collection is not None:
+                for mi in sub_collection.mof_coll:
+                    assert any(mi is parent_mi
+                               for parent_mi in mof_coll.mof_coll)
+            mof_coll = sub_collection
+    names = [] if mof_coll is None else [mi['mof_name']
+                                         for mi in mof_coll.mof_coll]
+    assert names == expected
+    assert stored_rows(parent) == before
+    assert properties.version == version
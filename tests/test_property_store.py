@@ -0,0 +1,145 @@
+import os
+import json
+import pickle
+import shutil
+import sqlite3
+import contextlib
+import io
+import pytest
+from omsdetector_forked.mof import Helper
+from omsdetector_forked.mof_collection import MofCollection
+from omsdetector_forked.property_store import PropertyStore
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+
+
+def baseline_properties():
+    """Properties of three MOFs as stored in properties.pickle by the
+    versions before the SQLite store: one analysed, one only loaded and one
+    that could not be read."""
+    return {
+        'a' * 64: {
+            'mof_name': 'HKUST-1_ASR_FIQCEN_clean', 'cif_okay': True,
+            'problematic': False, 'has_oms': True,
+            'metal_sites': [{'metal': 'Cu', 'type': 'closed', 'is_open': True,
+                             'unique': True, 't_factor': 0.0123}],
+            'oms_density': 0.00021880904493558416, 'checksum': 'a' * 64,
+            'metal_species': ['Cu'], 'non_metal_species': ['O', 'H', 'C'],
+            'name': 'HKUST-1_ASR_FIQCEN_clean',
+            'uc_volume': 4570.194985743816, 'density': 0.8790977161468311,
+            'date_created': '2018-03-12T10:00:00.000000',
+            'load_balancing_index': 24336,
+            'source_name': 'analysis_folder/oms_results/'
+                           'HKUST-1_ASR_FIQCEN_clean/'},
+        'b' * 64: {
+            'mof_name': 'ZIF-8_ASR_FAWCEN_SL', 'cif_okay': True,
+            'metal_species': ['Zn'], 'non_metal_species': ['N', 'H', 'C'],
+            'uc_volume': 2392.428528932786, 'density': 0.9478402784789691,
+            'load_balancing_index': 19044},
+        'c' * 64: {
+            'mof_name': 'broken', 'cif_okay': False, 'metal_species': None,
+            'non_metal_species': None, 'uc_volume': None, 'density': None,
+            'load_balancing_index': 0}}
+
+
+def write_pickle(filename, properties):
+    with open(filename, 'wb') as properties_file:
+        pickle.dump(properties, properties_file)
+
+
+def test_migrate_pickle(tmp_path):
+    """Every property of a baseline pickle survives the migration and
+    reopening the database, and the pickle is imported only once."""
+    properties = baseline_properties()
+    pickle_filename = str(tmp_path / 'properties.pickle')
+    write_pickle(pickle_filename, properties)
+    filename = str(tmp_path / 'properties.sqlite')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        store = PropertyStore(filename)
+        store.migrate_pickle(pickle_filename)
+    store.close()
+
+    store = PropertyStore(filename)
+    assert sorted(store.keys()) == sorted(properties)
+    for checksum, expected in properties.items():
+        assert dict(store[checksum]) == expected
+    assert store.mof_names() == {c: p['mof_name']
+                                 for c, p in properties.items()}
+    table = store.property_columns()
+    assert table.loc['a' * 64, 'has_oms'] == 1
+    assert table.loc['a' * 64, 'metal_species'] == ',Cu,'
+    assert table.loc['b' * 64, 'non_metal_species'] == ',C,H,N,'
+    assert table.loc['c' * 64, 'cif_okay'] == 0
+    assert table.loc['c' * 64, 'density'] != table.loc['c' * 64, 'density']
+
+    # A pickle changed after the migration is not imported again.
+    properties['a' * 64]['has_oms'] = False
+    write_pickle(pickle_filename, properties)
+    store.migrate_pickle(pickle_filename)
+    assert store['a' * 64]['has_oms'] is True
+    store.close()
+
+
+def test_migrate_pickle_in_collection(tmp_path):
+    """A collection opened on an analysis folder of an older version keeps
+    the properties of its pickle."""
+    cif_folder = tmp_path / 'cifs'
+    cif_folder.mkdir()
+    names = ['HKUST-1_ASR_FIQCEN_clean', 'ZIF-8_ASR_FAWCEN_SL']
+    for name in names:
+        shutil.copy(os.path.join(EXAMPLES, name + '.cif'), str(cif_folder))
+    analysis_folder = tmp_path / 'analysis'
+    analysis_folder.mkdir()
+    old = baseline_properties()
+    properties = {}
+    for name, key in zip(names, ['a' * 64, 'b' * 64]):
+        checksum = Helper.get_checksum(str(cif_folder / (name + '.cif')))
+        properties[checksum] = dict(old[key], checksum=checksum)
+        properties[checksum].pop('source_name', None)
+    write_pickle(str(analysis_folder / 'properties.pickle'), properties)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        mof_coll = MofCollection.from_folder(
+            str(cif_folder), analysis_folder=str(analysis_folder))
+    for checksum, expected in properties.items():
+        stored = dict(mof_coll.properties[checksum])
+        for key, value in expected.items():
+            assert stored[key] == value
+
+
+@pytest.mark.parametrize('reopen', [1, 2])
+def test_added_columns(tmp_path, reopen):
+    """A database created before the cif_okay and non_metal_species columns
+    existed gets them filled from the stored records, and can be reopened
+    afterwards."""
+    properties = baseline_properties()
+    filename = str(tmp_path / 'properties.sqlite')
+    conn = sqlite3.connect(filename)
+    with conn:
+        conn.execute(
+            'CREATE TABLE properties ('
+            'checksum TEXT PRIMARY KEY, mof_name TEXT, has_oms INTEGER, '
+            'metal_species TEXT, density REAL, uc_volume REAL, '
+            'oms_density REAL, data TEXT NOT NULL)')
+        conn.executemany(
+            'INSERT INTO properties (checksum, mof_name, data) '
+            'VALUES (?, ?, ?)',
+            [(c, p['mof_name'], json.dumps(p))
+             for c, p in properties.items()])
+    conn.close()
+
+    for _ in range(reopen):
+        store = PropertyStore(filename)
+        store.close()
+    store = PropertyStore(filename)
+    for checksum, expected in properties.items():
+        assert dict(store[checksum]) == expected
+    table = store.property_columns()
+    assert list(table.columns) == PropertyStore.indexed_columns
+    assert table.loc['a' * 64, 'cif_okay'] == 1
+    assert table.loc['c' * 64, 'cif_okay'] == 0
+    assert table.loc['a' * 64, 'non_metal_species'] == ',C,H,O,'
+    assert table.loc['b' * 64, 'metal_species'] == ',Zn,'
+    store.close()
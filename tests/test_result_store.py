@@ -0,0 +1,71 @@
+import os
+import glob
+import warnings
+import pytest
+from omsdetector_forked.mof import MofStructure
+from omsdetector_forked.result_store import ResultStore
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+CIF_FILES = sorted(glob.glob(os.path.join(EXAMPLES, '*.cif')))
+
+
+def assert_same(value, expected):
+    """Compare values and their types, so that 1 and 1.0 differ."""
+    assert type(value) is type(expected)
+    if isinstance(expected, dict):
+        assert value.keys() == expected.keys()
+        for key in expected:
+            assert_same(value[key], expected[key])
+    elif isinstance(expected, list):
+        assert len(value) == len(expected)
+        for v, e in zip(value, expected):
+            assert_same(v, e)
+    else:
+        assert value == expected
+
+
+@pytest.fixture(scope='module')
+def analysed_mofs():
+    mofs = []
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for cif_file in CIF_FILES:
+            mof = MofStructure.from_file(cif_file)
+            summary = mof.analyze_metals(None)
+            mofs.append((mof, summary))
+    return mofs
+
+
+def test_summaries_round_trip(analysed_mofs, tmp_path):
+    """The summaries read back from the store are the ones written, with the
+    same value types, and the metal sites match metal_summary."""
+    store = ResultStore(str(tmp_path), shard_size=20)
+    for mof, summary in analysed_mofs:
+        store.append(ResultStore.make_record(mof, summary))
+    store.flush()
+
+    store = ResultStore(str(tmp_path))
+    assert len(store) == len(analysed_mofs)
+    for mof, summary in analysed_mofs:
+        stored = store.get_summary(summary['name'])
+        assert_same(stored, summary)
+        expected_sites = [mcs.metal_summary
+                          for mcs in mof.metal_coord_spheres]
+        assert len(stored['metal_sites']) == len(expected_sites)
+        for site, expected in zip(stored['metal_sites'], expected_sites):
+            assert set(site) <= set(expected)
+            for key in site:
+                assert_same(site[key], expected[key])
+
+
+def test_coordination_spheres_round_trip(analysed_mofs, tmp_path):
+    store = ResultStore(str(tmp_path))
+    mof, summary = analysed_mofs[0]
+    store.append(ResultStore.make_record(mof, summary))
+    store.flush()
+    spheres = store.get_coordination_spheres(summary['name'])
+    assert len(spheres) == len(mof.metal_coord_spheres)
+    for sphere, expected in zip(spheres, mof.metal_coord_spheres):
+        assert sphere.species == expected.species
+        assert (sphere.frac_coords == expected.frac_coords).all()
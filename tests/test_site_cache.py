@@ -0,0 +1,118 @@
+import os
+import glob
+import math
+import warnings
+import pytest
+from omsdetector_forked.mof import MofStructure
+from omsdetector_forked.site_cache import SiteCache
+
+EXAMPLES = os.path.join(os.path.dirname(__file__), '..', 'examples',
+                        'cif_files_example')
+CIF_FILES = sorted(glob.glob(os.path.join(EXAMPLES, '*.cif')))
+
+
+def analyse_examples(site_cache=None):
+    """Analyse all the example CIF files.
+
+    :return: Dictionary of MOF name to the list of its metal site summaries.
+    """
+    results = {}
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        for cif_file in CIF_FILES:
+            mof = MofStructure.from_file(cif_file)
+            summary = mof.analyze_metals(None, verbose='none',
+                                         site_cache=site_cache)
+            results[mof.name] = summary['metal_sites']
+    return results
+
+
+def assert_same_sites(sites, expected):
+    assert len(sites) == len(expected)
+    for site, expected_site in zip(sites, expected):
+        for key in ['metal', 'type', 'is_open', 'unique', 'problematic']:
+            assert site[key] == expected_site[key]
+        # Spheres sharing a fingerprint can have t-factors differing by the
+        # rounding of their distances.
+        assert math.isclose(site['t_factor'], expected_site['t_factor'],
+                            abs_tol=1e-3)
+
+
+@pytest.fixture(scope='module')
+def cold_results():
+    return analyse_examples()
+
+
+def test_cached_runs_match_cold_run(cold_results, tmp_path):
+    """Two runs over the examples sharing a cache database give the results
+    of a run without cache, and the second run takes every classification
+    from the database."""
+    filename = str(tmp_path / 'site_cache.sqlite')
+    num_sites = sum(len(sites) for sites in cold_results.values())
+
+    # A small in memory cache and flush size exercise the eviction of
+    # entries and their writing to the database.
+    cache = SiteCache(filename, max_size=8, flush_size=5)
+    first = analyse_examples(cache)
+    cache.close()
+    assert cache.misses > 0
+    assert cache.hits + cache.misses == num_sites
+    assert cache.hits > 0
+
+    cache = SiteCache(filename, max_size=8)
+    second = analyse_examples(cache)
+    cache.close()
+    assert cache.misses == 0
+    assert cache.hits == num_sites
+
+    for results in (first, second):
+        assert results.keys() == cold_results.keys()
+        for name, sites in results.items():
+            assert_same_sites(sites, cold_results[name])
+
+
+def test_least_recently_used_entries_are_dropped(tmp_path):
+    cache = SiteCache(str(tmp_path / 'site_cache.sqlite'), max_size=2,
+                      flush_size=1)
+    cache.put('a', (True, '4,OMS', 0.5, False))
+    cache.put('b', (False, 'closed', -1, False))
+    assert cache.get('a') == (True, '4,OMS', 0.5, False)
+    cache.put('c', (True, '5,OMS', 0.25, True))
+    assert len(cache) == 2
+    assert 'b' not in cache._memory
+    # Dropped entries are read back from the database.
+    assert cache.get('b') == (False, 'closed', -1, False)
+    assert 'a' not in cache._memory
+
+    memory_only = SiteCache(max_size=1)
+    memory_only.put('a', (True, '4,OMS', 0.5, False))
+    memory_only.put('b', (False, 'closed', -1, False))
+    assert memory_only.get('a') is None
+    cache.close()
+
+
+def test_strict_mode_reports_mismatches():
+    """In strict mode a cached classification that differs from the
+    computed one is recorded and the computed one is used."""
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        mof = MofStructure.from_file(
+            os.path.join(EXAMPLES, 'HKUST-1_ASR_FIQCEN_clean.cif'))
+    site, same_site = mof.metal_coord_spheres[:2]
+    cache = SiteCache(strict=True)
+    key = cache.fingerprint(site)
+    assert cache.fingerprint(same_site) == key
+
+    same_site.check_if_open()
+    expected = same_site.classification
+    cache.check_if_open(site)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.check_if_open(same_site)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.mismatches == []
+
+    wrong = (not expected[0], 'wrong', expected[2] + 0.1, expected[3])
+    cache.put(key, wrong)
+    cache.check_if_open(same_site)
+    assert same_site.classification == expected
+    assert cache.mismatches == [(key, wrong, expected)]